@@ -1,9 +1,37 @@
 from ctypes import *
-from os import path
+from functools import lru_cache
+from os import environ, path
 import re
 
 P = POINTER
-vdex = CDLL(path.join(path.dirname(__file__), "target/debug/libvdex_web.so"))
+
+# The library is target/release when it has been built and target/debug
+# otherwise. VDEX_LIB overrides this with "release", "debug" or a path to
+# the library; LIBRARY and BUILD say which one was loaded.
+LIBRARY_NAME = "libvdex_web.so"
+BUILDS = ("release", "debug")
+
+def find_library(choice=None):
+    choice = choice or environ.get("VDEX_LIB")
+    if choice and choice not in BUILDS:
+        return choice, "custom"
+    for build in [choice] if choice else BUILDS:
+        filename = path.join(path.dirname(path.abspath(__file__)), "target",
+                build, LIBRARY_NAME)
+        if choice or path.exists(filename):
+            return filename, build
+    raise OSError("{} not found in target/release or target/debug"
+            .format(LIBRARY_NAME))
+
+LIBRARY, BUILD = find_library()
+vdex = CDLL(LIBRARY)
+
+# With VDEX_INSTRUMENT set, every binding is wrapped to count and time its
+# calls, and decoded name bytes are counted; see vdex_metrics.
+if environ.get("VDEX_INSTRUMENT"):
+    import vdex_metrics as _metrics
+else:
+    _metrics = None
 
 class Opaque (Structure):
     _fields_ = []
@@ -11,19 +39,66 @@ class Opaque (Structure):
 def _opaque_pointer_as_address(ptr):
     return addressof(ptr.contents)
 
+# Stands in for a function until its first call, which builds it and puts
+# it in the module in place of the stand-in.
+def _deferred(name, build):
+    built = None
+    def call(*args):
+        nonlocal built
+        if built is None:
+            built = build()
+            if globals().get(name) is call:
+                globals()[name] = built
+        return built(*args)
+    call.__name__ = name
+    globals()[name] = call
+    return call
+
+# Bindings look up their symbol and set their types on first call. An
+# array restype sized by a constant is given as a function returning it.
 def _f(name, restype, *argtypes, errcheck=None):
-    f = getattr(vdex, "vdex_" + name.lstrip("_"))
-    f.restype = restype
-    f.argtypes = argtypes
-    if errcheck is not None:
-        f.errcheck = errcheck
-    globals()[name] = f
-    return f
-
-def _c(name, typ):
-    c = typ.in_dll(vdex, "VDEX_" + name.lstrip("_")).value
-    globals()[name] = c
-    return c
+    def bind():
+        f = getattr(vdex, "vdex_" + name.lstrip("_"))
+        if callable(restype) and not isinstance(restype, type):
+            f.restype = restype()
+        else:
+            f.restype = restype
+        f.argtypes = argtypes
+        if errcheck is not None:
+            f.errcheck = errcheck
+        if _metrics is not None:
+            f = _metrics.instrument(name, f)
+        return f
+    return _deferred(name, bind)
+
+# Module attributes built on first access.
+_LAZY = {}
+
+def __getattr__(name):
+    build = _LAZY.get(name)
+    if build is None:
+        raise AttributeError("module {!r} has no attribute {!r}"
+                .format(__name__, name))
+    value = globals()[name] = build()
+    return value
+
+# Constants are read from the library on first access too, except those
+# that size a structure, which are needed as it is defined.
+def _c(name, typ, eager=False):
+    def read():
+        return typ.in_dll(vdex, "VDEX_" + name.lstrip("_")).value
+    if eager:
+        globals()[name] = read()
+    else:
+        _LAZY[name] = read
+
+# Code in this module does not go through __getattr__, so it reads deferred
+# constants with this.
+def _const(name):
+    try:
+        return globals()[name]
+    except KeyError:
+        return __getattr__(name)
 
 _f("_free_name", None, P(P(c_char)))
 
@@ -38,16 +113,56 @@ def _const_array_errcheck(result, func, arguments):
 def _cstr_errcheck(result, func, arguments):
     if not result:
         return None
-    buf = str(string_at(addressof(result.contents)), 'utf-8')
+    data = string_at(addressof(result.contents))
     _free_name(result)
-    return buf
+    if _metrics is not None:
+        _metrics.name_bytes("string", len(data) + 1)
+    return str(data, 'utf-8')
+
+class _NameTable (Structure):
+    _fields_ = [
+            ("data", c_void_p),
+            ("offsets", P(c_size_t)),
+            ("count", c_size_t),
+            ]
+
+def _decode_names(table):
+    offsets = table.offsets[:table.count + 1]
+    data = string_at(table.data, offsets[-1])
+    if _metrics is not None:
+        _metrics.name_bytes("table", len(data))
+    return tuple(str(data[a:b], 'utf-8') for a, b in zip(offsets, offsets[1:]))
+
+def _index(values, names):
+    if list(values) == list(range(len(names))):
+        return names
+    return dict(zip(values, names))
+
+ENUMS = []
 
 def _e(name, typ=c_uint8):
     globals()[name] = typ
+    ENUMS.append(name)
     sname = to_snake_case(name)
-    count = _c(sname.upper() + "_COUNT", c_size_t)
-    _f(sname + "_list", P(typ * count), errcheck=_const_array_errcheck)
-    _f(sname + "_name", P(c_char), typ, errcheck=_cstr_errcheck)
+    count = sname.upper() + "_COUNT"
+    _c(count, c_size_t)
+    _list = _f(sname + "_list", lambda: P(typ * _const(count)),
+            errcheck=_const_array_errcheck)
+    table = _f("_" + sname + "_names", _NameTable)
+    names = lru_cache(maxsize=None)(lambda: _decode_names(table()))
+    _LAZY[sname.upper() + "_NAMES"] = names
+    _deferred(sname + "_name", lambda: _index(_list(), names()).__getitem__)
+
+# Entity name tables need the pokedex, so they are decoded on first use.
+def _t(name):
+    table = _f("_" + name + "_names", _NameTable)
+    @lru_cache(maxsize=None)
+    def names():
+        return _decode_names(table())
+    def lookup(index):
+        return names()[index]
+    globals()[name + "_names"] = names
+    globals()[name + "_name"] = lookup
 
 def _cg(base, typ, names):
     s = [name.strip() for name in names.strip().split(" ")]
@@ -91,15 +206,36 @@ _c("INVALID_TARGET_TYPE", Efficacy)
 class InvalidTypeError (Exception):
     pass
 
-def _efficacy_errcheck(result, func, arguments):
-    if result == INVALID_DAMAGE_TYPE:
-        raise InvalidTypeError("Invalid damage type: {}".format(arguments[1]))
-    elif result == INVALID_TARGET_TYPE:
-        raise InvalidTypeError("Invalid target type: {}".format(arguments[2]))
-    else:
-        return result
-
-_f("efficacy", Efficacy, Type, Type, errcheck=_efficacy_errcheck)
+_f("_efficacy_table", c_size_t, P(Efficacy), c_size_t)
+
+# efficacy_table()[damage][target], fetched in one call.
+@lru_cache(maxsize=None)
+def efficacy_table():
+    count = _const("TYPE_COUNT")
+    table = ((Efficacy * count) * count)()
+    _efficacy_table(cast(table, P(Efficacy)), count * count)
+    return table
+
+@lru_cache(maxsize=None)
+def _efficacy_rows():
+    return tuple(tuple(row) for row in efficacy_table())
+
+# Looked up in the table rather than through the library, which is the
+# same answer without a foreign call per lookup.
+def efficacy(damage, target):
+    rows = _efficacy_rows()
+    if not 0 <= damage < len(rows):
+        raise InvalidTypeError("Invalid damage type: {}".format(damage))
+    if not 0 <= target < len(rows):
+        raise InvalidTypeError("Invalid target type: {}".format(target))
+    return rows[damage][target]
+
+@lru_cache(maxsize=None)
+def efficacy_matrix():
+    import numpy
+    matrix = numpy.ctypeslib.as_array(efficacy_table())
+    matrix.setflags(write=False)
+    return matrix
 
 # Items
 
@@ -116,6 +252,7 @@ _f("_free_item_iter", None, P(_ItemIter))
 class ItemIter:
     def __init__(self):
         self._iterator = _item_iter()
+        self._end = _const("_ITEM_ITER_END")
 
     def __iter__(self):
         return self
@@ -124,7 +261,7 @@ class ItemIter:
         if type(self._iterator) != _ItemIter:
             raise StopIteration
         item = _item_next(self._iterator)
-        if item == _ITEM_ITER_END:
+        if item == self._end:
             raise StopIteration
         return item
 
@@ -135,7 +272,7 @@ class ItemIter:
 
 item_iter = ItemIter
 
-_f("item_name", P(c_char), Item, errcheck=_cstr_errcheck)
+_t("item")
 
 # Item Details
 
@@ -164,18 +301,27 @@ class ItemDetails (Structure):
             ]
 
 _f("item_details", ItemDetails, Item)
+_f("item_count", c_size_t)
+_f("_item_details_all", c_size_t, P(Item), P(ItemDetails), c_size_t)
+
+def item_details_all():
+    count = item_count()
+    ids = (Item * count)()
+    details = (ItemDetails * count)()
+    _item_details_all(ids, details, count)
+    return ids, details
 
 # Moves
 
 Move = c_uint16
 _c("MOVE_COUNT", Move)
-_f("move_name", P(c_char), Move, errcheck=_cstr_errcheck)
+_t("move")
 
 # Move Details
 
 _c("NEVER_MISSES", c_uint8)
 
-_c("CHANGEABLE_STATS", c_size_t)
+_c("CHANGEABLE_STATS", c_size_t, eager=True)
 _cg("STAT_CHANGE", c_size_t, """
  ATTACK DEFENSE SPEED SPECIAL_ATTACK SPECIAL_DEFENSE ACCURACY EVASION
 """)
@@ -216,14 +362,25 @@ class MoveDetails (Structure):
             ]
 
 _f("move_details", MoveDetails, Move)
+_f("_move_details_all", c_size_t, P(MoveDetails), c_size_t)
+
+def move_details_all():
+    count = _const("MOVE_COUNT")
+    details = (MoveDetails * count)()
+    _move_details_all(details, count)
+    return details
 
 # Palace
 
 _c("PALACE_COUNT", c_size_t)
-_f("palace_low_attack", P(c_uint8 * PALACE_COUNT), errcheck=_const_array_errcheck)
-_f("palace_low_defense", P(c_uint8 * PALACE_COUNT), errcheck=_const_array_errcheck)
-_f("palace_high_attack", P(c_uint8 * PALACE_COUNT), errcheck=_const_array_errcheck)
-_f("palace_high_defense", P(c_uint8 * PALACE_COUNT), errcheck=_const_array_errcheck)
+_f("palace_low_attack", lambda: P(c_uint8 * _const("PALACE_COUNT")),
+        errcheck=_const_array_errcheck)
+_f("palace_low_defense", lambda: P(c_uint8 * _const("PALACE_COUNT")),
+        errcheck=_const_array_errcheck)
+_f("palace_high_attack", lambda: P(c_uint8 * _const("PALACE_COUNT")),
+        errcheck=_const_array_errcheck)
+_f("palace_high_defense", lambda: P(c_uint8 * _const("PALACE_COUNT")),
+        errcheck=_const_array_errcheck)
 
 # Species
 
@@ -232,7 +389,7 @@ Pokemon = c_uint16
 _c("SPECIES_COUNT", c_size_t)
 _c("POKEMON_COUNT", c_size_t)
 
-_f("species_name", P(c_char), Species, errcheck=_cstr_errcheck)
+_t("species")
 
 # Species Details
 
@@ -259,10 +416,24 @@ class SpeciesDetails (Structure):
             ]
 
 _f("species_details", SpeciesDetails, Species)
+_f("_species_details_all", c_size_t, P(SpeciesDetails), c_size_t)
+
+def species_details_all():
+    count = _const("SPECIES_COUNT")
+    details = (SpeciesDetails * count)()
+    _species_details_all(details, count)
+    return details
 
 # Pokemon
 
 _f("pokemon_count", c_size_t, Species)
+_f("_pokemon_count_all", c_size_t, P(c_size_t), c_size_t)
+
+def pokemon_count_all():
+    count = _const("SPECIES_COUNT")
+    counts = (c_size_t * count)()
+    _pokemon_count_all(counts, count)
+    return counts
 
 class PokemonHandle (Structure):
     _fields_ = [("ptr", P(Opaque))]
@@ -271,7 +442,7 @@ _f("pokemon", PokemonHandle, Species, c_size_t)
 
 # Pokemon Details
 
-_c("PERMANENT_STATS", c_size_t)
+_c("PERMANENT_STATS", c_size_t, eager=True)
 _cg("STAT_PERMANENT", c_size_t, """
  HP ATTACK DEFENSE SPEED SPECIAL_ATTACK SPECIAL_DEFENSE 
 """)
@@ -291,6 +462,24 @@ class PokemonDetails (Structure):
             ]
 
 _f("pokemon_details", PokemonDetails, PokemonHandle)
+_f("_pokemon_details_all", c_size_t, P(PokemonDetails), c_size_t)
+
+# Every form of every species, in species order; pokemon_count_all() gives
+# the number of forms belonging to each species.
+def pokemon_details_all():
+    count = _const("POKEMON_COUNT")
+    details = (PokemonDetails * count)()
+    _pokemon_details_all(details, count)
+    return details
+
+def default_pokemon_details_all():
+    details = pokemon_details_all()
+    defaults = (PokemonDetails * _const("SPECIES_COUNT"))()
+    offset = 0
+    for species, count in enumerate(pokemon_count_all()):
+        defaults[species] = details[offset]
+        offset += count
+    return defaults
 
 # Forms
 
@@ -311,3 +500,45 @@ class MovesetEntry (Structure):
             ]
 
 _f("moveset_entry", MovesetEntry, PokemonHandle, VersionGroup, c_size_t)
+_f("_moveset", c_size_t, PokemonHandle, VersionGroup, P(MovesetEntry), c_size_t)
+
+def moveset(handle, vg):
+    count = moveset_entry_count(handle, vg)
+    entries = (MovesetEntry * count)()
+    _moveset(handle, vg, entries, count)
+    return entries
+
+# Learners
+
+# Every moveset entry, sorted by (move, version group). Pokemon are numbered
+# in species order, as in pokemon_details_all.
+class Learner (Structure):
+    _fields_ = [
+            ("mov", Move),
+            ("vg", VersionGroup),
+            ("pokemon", c_uint32),
+            ("learn_method", LearnMethod),
+            ("level", c_uint8),
+            ]
+
+_f("learner_count", c_size_t)
+_f("_learners_all", c_size_t, P(Learner), c_size_t)
+
+def learners_all():
+    count = learner_count()
+    learners = (Learner * count)()
+    _learners_all(learners, count)
+    return learners
+
+# Snapshots
+
+# Serve everything that needs the pokedex from a snapshot file written by
+# vdex_snapshot.py instead of building it in this process.
+def load_snapshot(filename):
+    import vdex_snapshot
+    snapshot = vdex_snapshot.Snapshot(filename)
+    snapshot.install(globals())
+    return snapshot
+
+if environ.get("VDEX_SNAPSHOT"):
+    load_snapshot(environ["VDEX_SNAPSHOT"])
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+import gc
+import sys
+import time
+import tracemalloc
+from os import path
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# The representation vdex_web.py used before the moveset store: a dict of
+# sorted tuple lists per Pokemon.
+def tuple_movesets(vdex_web, species, index):
+    _vdex = vdex_web._vdex
+    handle = _vdex.pokemon(species, index)
+    movesets = {}
+    for vg in _vdex.version_group_list():
+        movesets[_vdex.version_group_name(vg)] = moveset = []
+        for i in range(_vdex.moveset_entry_count(handle, vg)):
+            entry = _vdex.moveset_entry(handle, vg, i)
+            learn_method = _vdex.learn_method_name(entry.learn_method)
+            moveset.append((entry.learn_method, learn_method, entry.level,
+                    i, vdex_web.MOVES[entry.mov]))
+        moveset.sort()
+    return movesets
+
+def packed_movesets(vdex_web, species, index):
+    movesets = vdex_web.get_movesets(species, index)
+    for name in movesets:
+        movesets[name]
+    return movesets
+
+def measure(build, vdex_web):
+    pokemon = [(species, index) for species, count
+            in enumerate(vdex_web._vdex.pokemon_count_all())
+            for index in range(count)]
+    gc.collect()
+    tracemalloc.start()
+    t = time.perf_counter()
+    kept = [build(vdex_web, species, index) for species, index in pokemon]
+    elapsed = time.perf_counter() - t
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return kept, size, elapsed
+
+def main():
+    import vdex_web
+    before, before_size, before_time = measure(tuple_movesets, vdex_web)
+    after, after_size, after_time = measure(packed_movesets, vdex_web)
+    same = all(list(a[name]) == list(b[name])
+            for a, b in zip(before, after) for name in a)
+    print("tuple lists:            {:8.1f} MiB {:8.1f} ms".format(
+        before_size / 2**20, 1000 * before_time))
+    print("packed, shared:         {:8.1f} MiB {:8.1f} ms".format(
+        after_size / 2**20, 1000 * after_time))
+    info = vdex_web.MOVESETS.info()
+    print("movesets:               {:8d} ({} distinct, {} bytes)".format(
+        info["movesets"], info["distinct"], info["bytes"]))
+    print("same contents:          {:>8}".format(str(same)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+import subprocess
+import sys
+import time
+from os import path
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+def import_time():
+    code = "import time; t = time.perf_counter(); import vdex_web; " \
+            "print(time.perf_counter() - t)"
+    out = subprocess.check_output([sys.executable, "-c", code], cwd=ROOT)
+    return float(out)
+
+def timed(f):
+    t = time.perf_counter()
+    f()
+    return time.perf_counter() - t
+
+def main():
+    print("import vdex_web:        {:8.1f} ms".format(1000 * import_time()))
+    import vdex_web
+    count = vdex_web._vdex.SPECIES_COUNT
+    def walk():
+        for species in range(count):
+            vdex_web.get_species(species)
+    print("first walk (build):     {:8.1f} ms".format(1000 * timed(walk)))
+    print("second walk (memo):     {:8.1f} ms".format(1000 * timed(walk)))
+    info = vdex_web.cache_info()["species"]
+    print("species built:          {:8d} (of {})".format(info["misses"], count))
+    print("species hits:           {:8d}".format(info["hits"]))
+    first = [vdex_web.get_species(species) for species in range(count)]
+    stable = all(a is vdex_web.get_species(i) for i, a in enumerate(first))
+    print("identity stable:        {:>8}".format(str(stable)))
+
+if __name__ == '__main__':
+    main()
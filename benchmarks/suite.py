@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import timeit
+from os import path
+
+ROOT = path.dirname(path.dirname(path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Times the FFI, start-up, the rating kernels and every route, and saves the
+# results (seconds per call) as JSON. Two result files can be compared:
+#
+#   benchmarks/suite.py run [--only GROUP,...] [--lib LIB] [-o results.json]
+#   benchmarks/suite.py compare old.json new.json [--threshold 0.1]
+
+GROUPS = ["ffi", "startup", "kernels", "routes"]
+
+REPEAT = 5
+STARTUP_REPEAT = 3
+DEFAULT_THRESHOLD = 0.10
+
+TEAM = ["Pikachu", "Bulbasaur", "Charizard"]
+
+# Best of REPEAT runs of a loop long enough to time, per call.
+def per_call(f):
+    timer = timeit.Timer(f)
+    number, _ = timer.autorange()
+    return min(timer.repeat(REPEAT, number)) / number
+
+def bench_ffi():
+    import _vdex
+    handle = _vdex.pokemon(1, 0)
+    vg = _vdex.version_group_list()[-1]
+    item = _vdex.item_details_all()[0][0]
+    calls = {
+            "efficacy": lambda: _vdex.efficacy(0, 0),
+            "type_name": lambda: _vdex.type_name(0),
+            "move_name": lambda: _vdex.move_name(1),
+            "move_details": lambda: _vdex.move_details(1),
+            "move_details_all": _vdex.move_details_all,
+            "item_name": lambda: _vdex.item_name(item),
+            "item_details": lambda: _vdex.item_details(item),
+            "item_details_all": _vdex.item_details_all,
+            "species_name": lambda: _vdex.species_name(1),
+            "species_details": lambda: _vdex.species_details(1),
+            "species_details_all": _vdex.species_details_all,
+            "pokemon_count": lambda: _vdex.pokemon_count(1),
+            "pokemon_count_all": _vdex.pokemon_count_all,
+            "pokemon": lambda: _vdex.pokemon(1, 0),
+            "pokemon_details": lambda: _vdex.pokemon_details(handle),
+            "pokemon_details_all": _vdex.pokemon_details_all,
+            "form_count": lambda: _vdex.form_count(handle),
+            "form_name": lambda: _vdex.form_name(handle, 0),
+            "moveset_entry_count": lambda: _vdex.moveset_entry_count(handle, vg),
+            "moveset_entry": lambda: _vdex.moveset_entry(handle, vg, 0),
+            "moveset": lambda: _vdex.moveset(handle, vg),
+            "learners_all": _vdex.learners_all,
+            "palace_low_attack": _vdex.palace_low_attack,
+            }
+    return dict(("ffi." + name, per_call(f)) for name, f in calls.items())
+
+def import_time(module):
+    code = "import time; t = time.perf_counter(); import {}; " \
+            "print(time.perf_counter() - t)".format(module)
+    return min(float(subprocess.check_output([sys.executable, "-c", code],
+        cwd=ROOT)) for _ in range(STARTUP_REPEAT))
+
+def bench_startup():
+    return dict(("startup." + module, import_time(module))
+            for module in ("_vdex", "vdex_web", "vdex_web2", "vdex_web3"))
+
+def bench_kernels():
+    import vdex_rating
+    import vdex_test
+    import vdex_web3
+    team = [vdex_test.SPECIES[name] for name in TEAM]
+    team_dict = vdex_web3.team(TEAM)
+    return {
+            "kernels.rate": per_call(lambda: vdex_rating.rate(team[0])),
+            "kernels.ratings": per_call(lambda: vdex_rating.Ratings(
+                vdex_rating.features(), vdex_rating.WEIGHTS)),
+            "kernels.modified_rating": per_call(
+                lambda: vdex_web3.modified_rating(team_dict)),
+            "kernels.suggest": per_call(
+                lambda: vdex_web3.suggest(TEAM, 4, 12)),
+            "kernels.score_team": per_call(
+                lambda: vdex_test.score_team(*team)),
+            }
+
+def routes():
+    import _vdex
+    item = _vdex.item_details_all()[0][0]
+    poke = "&".join("poke=" + name for name in TEAM)
+    return {
+            "vdex_web": ["/", "/enums/", "/enums/Type", "/efficacy",
+                "/items/", "/items/{}".format(item), "/moves/",
+                "/moves/?type=Fire&page=1", "/moves/1", "/moves/1/learners",
+                "/palace", "/species/", "/species/1/", "/species/1/0",
+                "/api/moves/search?type=fire&class=physical&sort=-power",
+                "/api/moves/1/learners", "/api/autocomplete?q=pika",
+                "/api/v1/moves?id=1,2,3", "/api/v1/moves/1",
+                "/api/v1/species?id=1,2,3", "/api/v1/pokemon?species=1",
+                "/api/v1/forms/1-0", "/api/v1/movesets/1-0",
+                "/api/v1/efficacy", "/metrics"],
+            "vdex_web2": ["/rate/Pikachu", "/team?" + poke, "/metrics"],
+            "vdex_web3": ["/rate/Pikachu", "/team?" + poke,
+                "/suggest?" + poke, "/optimize?budget=0.5&" + poke,
+                "/cache", "/metrics"],
+            }
+
+# The first request to a URL and the steady state after it, since several
+# routes cache their results.
+def bench_routes():
+    import importlib
+    results = {}
+    for module, urls in routes().items():
+        app = importlib.import_module(module).app
+        client = app.test_client()
+        covered = set()
+        for url in urls:
+            start = time.perf_counter()
+            response = client.get(url)
+            first = time.perf_counter() - start
+            if response.status_code != 200:
+                raise RuntimeError("{} {}: HTTP {}".format(module, url,
+                    response.status_code))
+            covered.add(app.url_map.bind("").match(url.partition("?")[0])[0])
+            name = "routes.{}:{}".format(module, url)
+            results[name + ":first"] = first
+            results[name] = per_call(lambda: client.get(url))
+        for rule in app.url_map.iter_rules():
+            if rule.endpoint not in covered and rule.endpoint != "static":
+                print("{}: route not benchmarked: {}".format(module, rule),
+                        file=sys.stderr)
+    return results
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"],
+                cwd=ROOT, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(groups, output):
+    import _vdex
+    results = {}
+    for group in groups:
+        print("{}...".format(group), file=sys.stderr)
+        results.update(globals()["bench_" + group]())
+    data = {"meta": {"time": time.time(), "revision": git_revision(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "snapshot": os.environ.get("VDEX_SNAPSHOT"),
+                "library": _vdex.LIBRARY, "build": _vdex.BUILD},
+            "results": results}
+    with open(output, "w") as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+    for name, seconds in sorted(results.items()):
+        print("{:60s} {:12.3f} us".format(name, 1e6 * seconds))
+    print("saved to {}".format(output))
+
+# Returns the number of regressions beyond the threshold.
+def compare(old_file, new_file, threshold):
+    with open(old_file) as f:
+        old = json.load(f)["results"]
+    with open(new_file) as f:
+        new = json.load(f)["results"]
+    regressions = 0
+    for name in sorted(set(old) & set(new)):
+        change = new[name] / old[name] - 1 if old[name] else 0.0
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif change < -threshold:
+            flag = "  faster"
+        print("{:60s} {:12.3f} {:12.3f} us {:+7.1%}{}".format(name,
+            1e6 * old[name], 1e6 * new[name], change, flag))
+    for name in sorted(set(old) ^ set(new)):
+        print("{:60s} only in {}".format(name,
+            old_file if name in old else new_file))
+    print("{} regressions over {:.0%}".format(regressions, threshold))
+    return regressions
+
+def usage():
+    print("""Usage: {0} <command> [options]
+run [--only GROUP,...] [--lib LIB] [-o FILE]
+    Run the benchmark groups ({1}) and save the results as JSON
+    (default: benchmarks/results.json). LIB is "release", "debug" or a
+    path to the library, as for VDEX_LIB.
+compare <old> <new> [--threshold T]
+    Compare two result files. Exits with status 1 if any benchmark is
+    slower by more than T (default: {2}).
+""".format(sys.argv[0], ", ".join(GROUPS), DEFAULT_THRESHOLD))
+
+def main():
+    args = sys.argv[1:]
+    if args[:1] == ["run"]:
+        groups = GROUPS
+        output = path.join(ROOT, "benchmarks", "results.json")
+        args = args[1:]
+        while args:
+            if args[0] == "--only" and len(args) > 1:
+                groups = args[1].split(",")
+            elif args[0] == "--lib" and len(args) > 1:
+                os.environ["VDEX_LIB"] = args[1]
+            elif args[0] == "-o" and len(args) > 1:
+                output = args[1]
+            else:
+                return usage()
+            args = args[2:]
+        if any(group not in GROUPS for group in groups):
+            return usage()
+        run(groups, output)
+    elif args[:1] == ["compare"] and len(args) in (3, 5):
+        threshold = DEFAULT_THRESHOLD
+        if len(args) == 5:
+            if args[3] != "--threshold":
+                return usage()
+            threshold = float(args[4])
+        sys.exit(1 if compare(args[1], args[2], threshold) else 0)
+    else:
+        usage()
+
+if __name__ == '__main__':
+    main()
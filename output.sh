@@ -1,4 +1,3 @@
 #!/bin/sh
 cd "$(dirname "$0")"
-wget --mirror --page-requisites --adjust-extension --no-parent --convert-links \
-     --directory-prefix=output "http://$1/"
+FLASK_APP=vdex_web.py flask build-static "output/${1:-localhost:5000}"
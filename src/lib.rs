@@ -7,6 +7,7 @@ use vdex::versions::VersionGroup;
 use std::ffi::CString;
 use std::fmt::Debug;
 use std::ptr::{null, null_mut};
+use std::sync::OnceLock;
 
 // MEMORY MANAGEMENT //////////////////////////////////////////////////////////
 
@@ -31,6 +32,47 @@ pub unsafe extern "C" fn vdex_free_name(name: *mut *mut Arch8) {
     }
 }
 
+// Names packed into one UTF-8 buffer (not NUL-terminated); name i is
+// data[offsets[i]..offsets[i + 1]]. Tables are built once and never freed.
+#[repr(C)] pub struct VDexNameTable {
+    pub data: *const u8,
+    pub offsets: *const usize,
+    pub count: usize,
+}
+
+struct NameTable {
+    data: String,
+    offsets: Vec<usize>,
+}
+
+impl NameTable {
+    fn new(names: impl Iterator<Item = String>) -> Self {
+        let mut table = NameTable { data: String::new(), offsets: vec![0] };
+        for name in names {
+            table.data.push_str(&name);
+            table.offsets.push(table.data.len());
+        }
+        table
+    }
+
+    fn export(&self) -> VDexNameTable {
+        VDexNameTable {
+            data: self.data.as_ptr(),
+            offsets: self.offsets.as_ptr(),
+            count: self.offsets.len() - 1,
+        }
+    }
+}
+
+unsafe fn fill<T>(out: *mut T, len: usize, values: impl Iterator<Item = T>) -> usize {
+    let mut written = 0;
+    for value in values.take(len) {
+        out.add(written).write(value);
+        written += 1;
+    }
+    written
+}
+
 #[repr(C)] pub struct VDexOpaque { _opaque: [u8; 0] }
 
 trait Opaque {
@@ -88,7 +130,7 @@ trait OpaqueConst {
 // ENUMS //////////////////////////////////////////////////////////////////////
 
 macro_rules! vdex_enum {
-    ($e:ty, $r:ident, $c:ident, $l:ident, $n:ident) => {
+    ($e:ty, $r:ident, $c:ident, $l:ident, $n:ident, $t:ident) => {
         type $r = <$e as Enum>::Repr;
 
         #[no_mangle]
@@ -103,57 +145,65 @@ macro_rules! vdex_enum {
         pub extern "C" fn $n(repr: $r) -> *mut Arch8 {
             allocate_enum_name::<$e>(repr)
         }
+
+        #[no_mangle]
+        pub extern "C" fn $t() -> VDexNameTable {
+            static TABLE: OnceLock<NameTable> = OnceLock::new();
+            TABLE.get_or_init(|| NameTable::new(
+                <$e as Enum>::VALUES.iter().map(|v| format!("{:?}", v))
+            )).export()
+        }
     };
 }
 
 vdex_enum!(vdex::Ability, AbilityRepr, VDEX_ABILITY_COUNT,
-        vdex_ability_list, vdex_ability_name);
+        vdex_ability_list, vdex_ability_name, vdex_ability_names);
 vdex_enum!(vdex::Efficacy, EfficacyRepr, VDEX_EFFICACY_COUNT,
-        vdex_efficacy_list, vdex_efficacy_name);
+        vdex_efficacy_list, vdex_efficacy_name, vdex_efficacy_names);
 vdex_enum!(vdex::Nature, NatureRepr, VDEX_NATURE_COUNT,
-        vdex_nature_list, vdex_nature_name);
+        vdex_nature_list, vdex_nature_name, vdex_nature_names);
 vdex_enum!(vdex::Type, TypeRepr, VDEX_TYPE_COUNT,
-        vdex_type_list, vdex_type_name);
+        vdex_type_list, vdex_type_name, vdex_type_names);
 
 vdex_enum!(vdex::items::Category, ItemCategoryRepr, VDEX_ITEM_CATEGORY_COUNT,
-        vdex_item_category_list, vdex_item_category_name);
+        vdex_item_category_list, vdex_item_category_name, vdex_item_category_names);
 vdex_enum!(vdex::items::Flavor, FlavorRepr, VDEX_FLAVOR_COUNT,
-        vdex_flavor_list, vdex_flavor_name);
+        vdex_flavor_list, vdex_flavor_name, vdex_flavor_names);
 vdex_enum!(vdex::items::FlingEffect, FlingEffectRepr, VDEX_FLING_EFFECT_COUNT,
-        vdex_fling_effect_list, vdex_fling_effect_name);
+        vdex_fling_effect_list, vdex_fling_effect_name, vdex_fling_effect_names);
 vdex_enum!(vdex::items::Pocket, PocketRepr, VDEX_POCKET_COUNT,
-        vdex_pocket_list, vdex_pocket_name);
+        vdex_pocket_list, vdex_pocket_name, vdex_pocket_names);
 
 vdex_enum!(vdex::moves::Ailment, AilmentRepr, VDEX_AILMENT_COUNT,
-        vdex_ailment_list, vdex_ailment_name);
+        vdex_ailment_list, vdex_ailment_name, vdex_ailment_names);
 vdex_enum!(vdex::moves::BattleStyle, BattleStyleRepr, VDEX_BATTLE_STYLE_COUNT,
-        vdex_battle_style_list, vdex_battle_style_name);
+        vdex_battle_style_list, vdex_battle_style_name, vdex_battle_style_names);
 vdex_enum!(vdex::moves::Category, MoveCategoryRepr, VDEX_MOVE_CATEGORY_COUNT,
-        vdex_move_category_list, vdex_move_category_name);
+        vdex_move_category_list, vdex_move_category_name, vdex_move_category_names);
 vdex_enum!(vdex::moves::DamageClass, DamageClassRepr, VDEX_DAMAGE_CLASS_COUNT,
-        vdex_damage_class_list, vdex_damage_class_name);
+        vdex_damage_class_list, vdex_damage_class_name, vdex_damage_class_names);
 vdex_enum!(vdex::moves::Effect, MoveEffectRepr, VDEX_MOVE_EFFECT_COUNT,
-        vdex_move_effect_list, vdex_move_effect_name);
+        vdex_move_effect_list, vdex_move_effect_name, vdex_move_effect_names);
 vdex_enum!(vdex::moves::LearnMethod, LearnMethodRepr, VDEX_LEARN_METHOD_COUNT,
-        vdex_learn_method_list, vdex_learn_method_name);
+        vdex_learn_method_list, vdex_learn_method_name, vdex_learn_method_names);
 vdex_enum!(vdex::moves::Target, MoveTargetRepr, VDEX_MOVE_TARGET_COUNT,
-        vdex_move_target_list, vdex_move_target_name);
+        vdex_move_target_list, vdex_move_target_name, vdex_move_target_names);
 
 vdex_enum!(vdex::pokemon::EggGroup, EggGroupRepr, VDEX_EGG_GROUP_COUNT,
-        vdex_egg_group_list, vdex_egg_group_name);
+        vdex_egg_group_list, vdex_egg_group_name, vdex_egg_group_names);
 vdex_enum!(vdex::pokemon::EvolutionTrigger, EvolutionTriggerRepr,
         VDEX_EVOLUTION_TRIGGER_COUNT,
-        vdex_evolution_trigger_list, vdex_evolution_trigger_name);
+        vdex_evolution_trigger_list, vdex_evolution_trigger_name, vdex_evolution_trigger_names);
 vdex_enum!(vdex::pokemon::Gender, GenderRepr, VDEX_GENDER_COUNT,
-        vdex_gender_list, vdex_gender_name);
+        vdex_gender_list, vdex_gender_name, vdex_gender_names);
 
 vdex_enum!(vdex::versions::Generation, GenerationRepr, VDEX_GENERATION_COUNT,
-        vdex_generation_list, vdex_generation_name);
+        vdex_generation_list, vdex_generation_name, vdex_generation_names);
 vdex_enum!(vdex::versions::Version, VersionRepr, VDEX_VERSION_COUNT,
-        vdex_version_list, vdex_version_name);
+        vdex_version_list, vdex_version_name, vdex_version_names);
 vdex_enum!(vdex::versions::VersionGroup, VersionGroupRepr,
         VDEX_VERSION_GROUP_COUNT,
-        vdex_version_group_list, vdex_version_group_name);
+        vdex_version_group_list, vdex_version_group_name, vdex_version_group_names);
 
 // EFFICACY ///////////////////////////////////////////////////////////////////
 
@@ -173,6 +223,15 @@ pub extern "C" fn vdex_efficacy(damage: TypeRepr, target: TypeRepr) -> EfficacyR
     efficacy(damage, target).unwrap_or_else(|e| e)
 }
 
+// Row-major by damage type, then target type.
+#[no_mangle]
+pub unsafe extern "C" fn vdex_efficacy_table(table: *mut EfficacyRepr, len: usize) -> usize {
+    let types = <vdex::Type as Enum>::VALUES;
+    let efficacy = &pokedex().efficacy;
+    fill(table, len, types.iter().flat_map(
+        |&damage| types.iter().map(move |&target| efficacy[(damage, target)].repr())))
+}
+
 // ITEMS //////////////////////////////////////////////////////////////////////
 
 type ItemIdRepr = u16;
@@ -216,6 +275,18 @@ pub extern "C" fn vdex_item_name(id: ItemIdRepr) -> *mut Arch8 {
     allocate_name(pokedex().items[ItemId(id)].name.clone())
 }
 
+// Indexed by item id; ids without an item have an empty name.
+#[no_mangle]
+pub extern "C" fn vdex_item_names() -> VDexNameTable {
+    static TABLE: OnceLock<NameTable> = OnceLock::new();
+    TABLE.get_or_init(|| {
+        let items = &pokedex().items.0;
+        let end = items.keys().map(|id| id.0 as usize + 1).max().unwrap_or(0);
+        NameTable::new((0..end).map(|id| items.get(&ItemId(id as ItemIdRepr))
+                .map_or(String::new(), |item| item.name.clone())))
+    }).export()
+}
+
 // ITEM DETAILS ///////////////////////////////////////////////////////////////
 
 type BooleanRepr = u8;
@@ -254,8 +325,7 @@ pub static VDEX_NO_DOMINANT_FLAVOR: FlavorRepr = std::u8::MAX;
     pub flavor: FlavorRepr
 }
 
-#[no_mangle]
-pub extern "C" fn vdex_item_details(id: ItemIdRepr) -> VDexItemDetails {
+fn item_details(id: ItemIdRepr) -> VDexItemDetails {
     let item = &pokedex().items[ItemId(id)];
     VDexItemDetails {
         category: item.category.repr(),
@@ -273,6 +343,26 @@ pub extern "C" fn vdex_item_details(id: ItemIdRepr) -> VDexItemDetails {
     }
 }
 
+#[no_mangle]
+pub extern "C" fn vdex_item_details(id: ItemIdRepr) -> VDexItemDetails {
+    item_details(id)
+}
+
+#[no_mangle]
+pub extern "C" fn vdex_item_count() -> usize {
+    pokedex().items.0.len()
+}
+
+#[no_mangle]
+pub unsafe extern "C" fn vdex_item_details_all(
+    ids: *mut ItemIdRepr, details: *mut VDexItemDetails, len: usize
+) -> usize {
+    let mut all: Vec<ItemIdRepr> = pokedex().items.0.keys().map(|id| id.0).collect();
+    all.sort();
+    fill(ids, len, all.iter().cloned());
+    fill(details, len, all.iter().map(|&id| item_details(id)))
+}
+
 // MOVES //////////////////////////////////////////////////////////////////////
 
 type MoveIdRepr = u16;
@@ -285,6 +375,14 @@ pub extern "C" fn vdex_move_name(id: MoveIdRepr) -> *mut Arch8 {
     allocate_name(pokedex().moves[MoveId(id)].name.clone())
 }
 
+#[no_mangle]
+pub extern "C" fn vdex_move_names() -> VDexNameTable {
+    static TABLE: OnceLock<NameTable> = OnceLock::new();
+    TABLE.get_or_init(|| NameTable::new((0..VDEX_MOVE_COUNT).map(
+        |id| pokedex().moves[MoveId(id as MoveIdRepr)].name.clone()
+    ))).export()
+}
+
 // MOVE DETAILS ///////////////////////////////////////////////////////////////
 
 #[no_mangle]
@@ -365,8 +463,7 @@ pub static VDEX_MOVE_FLAG_AUTHENTIC: MoveFlagsRepr = 0x2000;
     pub flags: MoveFlagsRepr,
 }
 
-#[no_mangle]
-pub extern "C" fn vdex_move_details(id: MoveIdRepr) -> VDexMoveDetails {
+fn move_details(id: MoveIdRepr) -> VDexMoveDetails {
     let mov = &pokedex().moves[MoveId(id)];
     VDexMoveDetails {
         generation: mov.generation.repr(),
@@ -397,6 +494,18 @@ pub extern "C" fn vdex_move_details(id: MoveIdRepr) -> VDexMoveDetails {
     }
 }
 
+#[no_mangle]
+pub extern "C" fn vdex_move_details(id: MoveIdRepr) -> VDexMoveDetails {
+    move_details(id)
+}
+
+#[no_mangle]
+pub unsafe extern "C" fn vdex_move_details_all(
+    details: *mut VDexMoveDetails, len: usize
+) -> usize {
+    fill(details, len, (0..VDEX_MOVE_COUNT).map(|id| move_details(id as MoveIdRepr)))
+}
+
 // PALACE /////////////////////////////////////////////////////////////////////
 
 #[no_mangle]
@@ -437,6 +546,14 @@ pub extern "C" fn vdex_species_name(id: SpeciesIdRepr) -> *mut Arch8 {
     allocate_name(pokedex().species[SpeciesId(id)].name.clone())
 }
 
+#[no_mangle]
+pub extern "C" fn vdex_species_names() -> VDexNameTable {
+    static TABLE: OnceLock<NameTable> = OnceLock::new();
+    TABLE.get_or_init(|| NameTable::new((0..VDEX_SPECIES_COUNT).map(
+        |id| pokedex().species[SpeciesId(id as SpeciesIdRepr)].name.clone()
+    ))).export()
+}
+
 // SPECIES DETAILS ////////////////////////////////////////////////////////////
 
 #[no_mangle]
@@ -461,8 +578,7 @@ pub static VDEX_NO_STAT_DEPENDENCE: i8 = std::i8::MAX;
     pub evolves_from: VDexEvolvesFrom,
 }
 
-#[no_mangle]
-pub extern "C" fn vdex_species_details(id: SpeciesIdRepr) -> VDexSpeciesDetails {
+fn species_details(id: SpeciesIdRepr) -> VDexSpeciesDetails {
     let species = &pokedex().species[SpeciesId(id)];
     VDexSpeciesDetails {
         generation: species.generation.repr(),
@@ -485,13 +601,37 @@ pub extern "C" fn vdex_species_details(id: SpeciesIdRepr) -> VDexSpeciesDetails
     }
 }
 
+#[no_mangle]
+pub extern "C" fn vdex_species_details(id: SpeciesIdRepr) -> VDexSpeciesDetails {
+    species_details(id)
+}
+
+#[no_mangle]
+pub unsafe extern "C" fn vdex_species_details_all(
+    details: *mut VDexSpeciesDetails, len: usize
+) -> usize {
+    fill(details, len,
+            (0..VDEX_SPECIES_COUNT).map(|id| species_details(id as SpeciesIdRepr)))
+}
+
 // POKEMON ////////////////////////////////////////////////////////////////////
 
+fn all_pokemon() -> impl Iterator<Item = &'static vdex::pokemon::Pokemon> {
+    (0..VDEX_SPECIES_COUNT).flat_map(
+        |id| pokedex().species[SpeciesId(id as SpeciesIdRepr)].pokemon.iter())
+}
+
 #[no_mangle]
 pub extern "C" fn vdex_pokemon_count(species: SpeciesIdRepr) -> usize {
     pokedex().species[SpeciesId(species)].pokemon.len()
 }
 
+#[no_mangle]
+pub unsafe extern "C" fn vdex_pokemon_count_all(counts: *mut usize, len: usize) -> usize {
+    fill(counts, len, (0..VDEX_SPECIES_COUNT).map(
+        |id| pokedex().species[SpeciesId(id as SpeciesIdRepr)].pokemon.len()))
+}
+
 #[repr(C)] pub struct VDexPokemon { ptr: *const VDexOpaque }
 
 impl OpaqueConst for VDexPokemon {
@@ -545,11 +685,7 @@ pub static VDEX_STAT_PERMANENT_SPECIAL_DEFENSE: usize = 5;
     type2: TypeRepr,
 }
 
-#[no_mangle]
-pub unsafe extern "C" fn vdex_pokemon_details(
-    pokemon: VDexPokemon
-) -> VDexPokemonDetails {
-    let pokemon_ref = pokemon.as_ref();
+fn pokemon_details(pokemon_ref: &vdex::pokemon::Pokemon) -> VDexPokemonDetails {
     VDexPokemonDetails {
         id: pokemon_ref.id.0,
         ability1: pokemon_ref.abilities.first().repr(),
@@ -564,6 +700,20 @@ pub unsafe extern "C" fn vdex_pokemon_details(
     }
 }
 
+#[no_mangle]
+pub unsafe extern "C" fn vdex_pokemon_details(
+    pokemon: VDexPokemon
+) -> VDexPokemonDetails {
+    pokemon_details(pokemon.as_ref())
+}
+
+#[no_mangle]
+pub unsafe extern "C" fn vdex_pokemon_details_all(
+    details: *mut VDexPokemonDetails, len: usize
+) -> usize {
+    fill(details, len, all_pokemon().map(pokemon_details))
+}
+
 // FORMS /////////////////////////////////////////////////////////////////////
 
 #[no_mangle]
@@ -623,3 +773,60 @@ pub unsafe extern "C" fn vdex_moveset_entry(
         level: entry.level,
     }
 }
+
+#[no_mangle]
+pub unsafe extern "C" fn vdex_moveset(
+    pokemon: VDexPokemon, vg: VersionGroupRepr,
+    entries: *mut VDexMovesetEntry, len: usize
+) -> usize {
+    let e = &VersionGroup::from_repr(vg).unwrap();
+    pokemon.as_ref().moves.get(e).map_or(0, |moves| fill(entries, len,
+        moves.iter().map(|entry| VDexMovesetEntry {
+            mov: entry.move_id.0,
+            learn_method: entry.learn_method.repr(),
+            level: entry.level,
+        })))
+}
+
+// Every moveset entry of every Pokemon, sorted by (move, version group) so
+// that the learners of a move are one contiguous run. Pokemon are numbered
+// in species order, as in vdex_pokemon_details_all.
+#[repr(C)] #[derive(Clone, Copy)] pub struct VDexLearner {
+    pub mov: MoveIdRepr,
+    pub vg: VersionGroupRepr,
+    pub pokemon: u32,
+    pub learn_method: LearnMethodRepr,
+    pub level: u8,
+}
+
+fn learners() -> &'static [VDexLearner] {
+    static LEARNERS: OnceLock<Vec<VDexLearner>> = OnceLock::new();
+    LEARNERS.get_or_init(|| {
+        let mut learners = Vec::new();
+        for (index, pokemon) in all_pokemon().enumerate() {
+            for vg in <VersionGroup as Enum>::VALUES.iter() {
+                for entry in pokemon.moves.get(vg).into_iter().flatten() {
+                    learners.push(VDexLearner {
+                        mov: entry.move_id.0,
+                        vg: vg.repr(),
+                        pokemon: index as u32,
+                        learn_method: entry.learn_method.repr(),
+                        level: entry.level,
+                    });
+                }
+            }
+        }
+        learners.sort_by_key(|l| (l.mov, l.vg, l.pokemon, l.learn_method, l.level));
+        learners
+    })
+}
+
+#[no_mangle]
+pub extern "C" fn vdex_learner_count() -> usize {
+    learners().len()
+}
+
+#[no_mangle]
+pub unsafe extern "C" fn vdex_learners_all(out: *mut VDexLearner, len: usize) -> usize {
+    fill(out, len, learners().iter().copied())
+}
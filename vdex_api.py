@@ -0,0 +1,309 @@
+import collections
+import flask
+import functools
+import json
+import struct
+import threading
+import _vdex
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Versioned data API. Every entity is serialized once, to JSON and (when
+# msgpack is installed) MessagePack, and the encoded bytes are kept. A batch
+# response is those bytes joined inside an array, so answering a request
+# never encodes anything.
+#
+#   /api/v1/<kind>?id=1,2,3    batch, in the order asked for
+#   /api/v1/<kind>             every entity of the kind, a page at a time
+#                              (?offset=&limit=; X-Total-Count and a Link
+#                              header to the next page)
+#   /api/v1/<kind>/<id>        one entity
+#
+# Pokemon, forms and movesets are keyed "<species>-<index>"; ?species= asks
+# for every Pokemon of the given species. No request gets more than
+# MAX_BATCH entities, and each kind keeps the encoded bytes of at most
+# maxsize entities, least recently used first out.
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+
+MAX_BATCH = 1000
+PAYLOAD_CACHE_SIZE = 4096
+
+api = flask.Blueprint("api_v1", __name__, url_prefix="/api/v1")
+
+def _flags(flags, names, prefix):
+    return [name for name in names if flags & getattr(_vdex, prefix + name)]
+
+def move_record(move, d):
+    return {"id": move, "name": _vdex.move_name(move),
+            "generation": _vdex.generation_name(d.generation),
+            "type": _vdex.type_name(d.typ), "power": d.power, "pp": d.pp,
+            "accuracy": None if d.accuracy == _vdex.NEVER_MISSES
+                else d.accuracy,
+            "priority": d.priority,
+            "target": _vdex.move_target_name(d.target),
+            "damage_class": _vdex.damage_class_name(d.damage_class),
+            "effect": _vdex.move_effect_name(d.effect),
+            "effect_chance": d.effect_chance,
+            "category": _vdex.move_category_name(d.category),
+            "ailment": _vdex.ailment_name(d.ailment),
+            "ailment_volatile": bool(d.ailment_volatile),
+            "ailment_chance": d.ailment_chance,
+            "hits": [d.min_hits, d.max_hits],
+            "turns": [d.min_turns, d.max_turns],
+            "recoil": d.recoil, "healing": d.healing,
+            "critical_rate": d.critical_rate,
+            "flinch_chance": d.flinch_chance, "stat_chance": d.stat_chance,
+            "stat_changes": dict((name, d.stat_changes[index])
+                for index, name in enumerate(_vdex.STAT_CHANGE)
+                if d.stat_changes[index]),
+            "flags": _flags(d.flags, _vdex.MOVE_FLAG, "MOVE_FLAG_")}
+
+def item_record(item, d):
+    return {"id": item, "name": _vdex.item_name(item),
+            "category": _vdex.item_category_name(d.category),
+            "pocket": _vdex.pocket_name(d.pocket), "unused": bool(d.unused),
+            "cost": d.cost, "fling_power": d.fling_power,
+            "fling_effect": _vdex.fling_effect_name(d.fling_effect),
+            "flags": _flags(d.flags, _vdex.ITEM_FLAG, "ITEM_FLAG_"),
+            "natural_gift_power": d.natural_gift_power,
+            "natural_gift_type": _vdex.type_name(d.natural_gift_type),
+            "flavor": None if d.flavor == _vdex.NO_DOMINANT_FLAVOR
+                else _vdex.flavor_name(d.flavor)}
+
+def species_record(species, d):
+    egg_groups = [_vdex.egg_group_name(d.egg_group1)]
+    if d.has_egg_group2:
+        egg_groups.append(_vdex.egg_group_name(d.egg_group2))
+    evolves_from = None
+    if d.evolved:
+        ef = d.evolves_from
+        evolves_from = {"species": ef.from_id,
+                "trigger": _vdex.evolution_trigger_name(ef.trigger),
+                "level": ef.level, "gender": _vdex.gender_name(ef.gender),
+                "move": ef.mov if ef.mov < _vdex.MOVE_COUNT else None,
+                "relative_physical_stats": ef.relative_physical_stats}
+    return {"id": species, "name": _vdex.species_name(species),
+            "generation": _vdex.generation_name(d.generation),
+            "egg_groups": egg_groups, "evolves_from": evolves_from,
+            "pokemon": _vdex.pokemon_count(species)}
+
+def pokemon_record(key, d):
+    abilities = [_vdex.ability_name(d.ability1)]
+    if d.has_ability2:
+        abilities.append(_vdex.ability_name(d.ability2))
+    types = [_vdex.type_name(d.type1)]
+    if d.has_type2:
+        types.append(_vdex.type_name(d.type2))
+    return {"id": key, "abilities": abilities,
+            "hidden_ability": _vdex.ability_name(d.hidden_ability)
+                if d.has_hidden_ability else None,
+            "types": types,
+            "stats": dict(zip(_vdex.STAT_PERMANENT, d.stats))}
+
+def forms_record(key, handle):
+    return {"id": key, "forms": [{"name": _vdex.form_name(handle, index),
+                "veekun_id": _vdex.form_veekun_id(handle, index),
+                "battle_only": bool(_vdex.form_battle_only(handle, index))}
+            for index in range(_vdex.form_count(handle))]}
+
+# [move, learn method, level] per entry, by version group.
+def moveset_record(key, handle):
+    return {"id": key, "movesets": dict((_vdex.version_group_name(vg),
+                [[entry.mov, _vdex.learn_method_name(entry.learn_method),
+                    entry.level] for entry in _vdex.moveset(handle, vg)])
+            for vg in _vdex.version_group_list())}
+
+def efficacy_record():
+    return {"types": list(_vdex.TYPE_NAMES),
+            "table": [list(row) for row in _vdex.efficacy_table()]}
+
+def encode(record):
+    return {JSON: json.dumps(record, separators=(",", ":")).encode('utf-8'),
+            MSGPACK: msgpack.packb(record) if msgpack is not None else None}
+
+def msgpack_array(count):
+    if count < 16:
+        return bytes([0x90 | count])
+    if count < 1 << 16:
+        return b"\xdc" + struct.pack(">H", count)
+    return b"\xdd" + struct.pack(">I", count)
+
+def join(parts, mimetype):
+    if mimetype == JSON:
+        return b"[" + b",".join(parts) + b"]"
+    return msgpack_array(len(parts)) + b"".join(parts)
+
+def pokemon_key(species, index):
+    return "{}-{}".format(species, index)
+
+# Only checks the form of the key; whether it exists is up to the Kind.
+def parse_pokemon_key(key):
+    species, _, index = key.partition("-")
+    return pokemon_key(int(species), int(index or 0))
+
+# The encoded payloads of one kind of entity, built on first use.
+class Kind:
+    def __init__(self, keys, build, parse=int, maxsize=PAYLOAD_CACHE_SIZE):
+        self.list_keys = keys
+        self._keys = None
+        self.known = None
+        self.build = build
+        self.parse = parse
+        self.maxsize = maxsize
+        self.payloads = collections.OrderedDict()
+        self.lock = threading.Lock()
+
+    def keys(self):
+        if self.known is None:
+            with self.lock:
+                if self.known is None:
+                    self._keys = list(self.list_keys())
+                    self.known = set(self._keys)
+        return self._keys
+
+    def __contains__(self, key):
+        self.keys()
+        return key in self.known
+
+    def get(self, key):
+        with self.lock:
+            payload = self.payloads.get(key)
+            if payload is not None:
+                self.payloads.move_to_end(key)
+                return payload
+        payload = encode(self.build(key))
+        with self.lock:
+            self.payloads[key] = payload
+            while len(self.payloads) > self.maxsize:
+                self.payloads.popitem(last=False)
+        return payload
+
+def _pokemon_keys():
+    return [pokemon_key(species, index)
+            for species, count in enumerate(_vdex.pokemon_count_all())
+            for index in range(count)]
+
+def _handle(key):
+    species, index = map(int, key.split("-"))
+    return _vdex.pokemon(species, index)
+
+def _pokemon_details(key):
+    return _vdex.pokemon_details(_handle(key))
+
+def _item_keys():
+    return list(_vdex.item_details_all()[0])
+
+KINDS = {
+        "moves": Kind(lambda: range(_vdex.MOVE_COUNT),
+            lambda move: move_record(move, _vdex.move_details(move))),
+        "items": Kind(_item_keys,
+            lambda item: item_record(item, _vdex.item_details(item))),
+        "species": Kind(lambda: range(_vdex.SPECIES_COUNT),
+            lambda species: species_record(species,
+                _vdex.species_details(species))),
+        "pokemon": Kind(_pokemon_keys,
+            lambda key: pokemon_record(key, _pokemon_details(key)),
+            parse_pokemon_key),
+        "forms": Kind(_pokemon_keys,
+            lambda key: forms_record(key, _handle(key)), parse_pokemon_key),
+        "movesets": Kind(_pokemon_keys,
+            lambda key: moveset_record(key, _handle(key)), parse_pokemon_key,
+            maxsize=256),
+        }
+
+@functools.lru_cache(maxsize=None)
+def efficacy_payload():
+    return encode(efficacy_record())
+
+def negotiate():
+    offered = [JSON] + ([MSGPACK] if msgpack is not None else [])
+    requested = flask.request.args.get("format")
+    if requested is not None:
+        mimetype = {"json": JSON, "msgpack": MSGPACK}.get(requested)
+        if mimetype not in offered:
+            flask.abort(406)
+        return mimetype
+    return flask.request.accept_mimetypes.best_match(offered, JSON)
+
+def error(status, message):
+    return flask.jsonify(error=message), status
+
+# (keys, page) where page is (offset, total) for a page of the whole
+# listing, or None when the keys were asked for.
+def requested_keys(kind, name):
+    args = flask.request.args
+    if "species" in args and kind.parse is parse_pokemon_key:
+        keys = []
+        for species in args["species"].split(","):
+            species = int(species)
+            if not 0 <= species < _vdex.SPECIES_COUNT:
+                raise KeyError(species)
+            keys.extend(pokemon_key(species, index)
+                    for index in range(_vdex.pokemon_count(species)))
+            if len(keys) > MAX_BATCH:
+                raise OverflowError(name)
+        return keys, None
+    if "id" not in args:
+        offset = int(args.get("offset", 0))
+        limit = int(args.get("limit", MAX_BATCH))
+        if offset < 0 or limit < 0:
+            raise ValueError(name)
+        if limit > MAX_BATCH:
+            raise OverflowError(name)
+        keys = kind.keys()
+        return keys[offset:offset + limit], (offset, len(keys))
+    ids = args["id"].split(",")
+    if len(ids) > MAX_BATCH:
+        raise OverflowError(name)
+    return [kind.parse(key) for key in ids if key], None
+
+@api.route("/efficacy")
+def efficacy():
+    mimetype = negotiate()
+    return flask.Response(efficacy_payload()[mimetype], mimetype=mimetype)
+
+@api.route("/<name>")
+def batch(name):
+    kind = KINDS.get(name)
+    if kind is None:
+        flask.abort(404)
+    mimetype = negotiate()
+    try:
+        keys, page = requested_keys(kind, name)
+        missing = [key for key in keys if key not in kind]
+        if missing:
+            return error(404, "Unknown {}: {}".format(name, missing[0]))
+    except (KeyError, ValueError):
+        return error(400, "Bad id list")
+    except OverflowError:
+        return error(400, "At most {} ids per request".format(MAX_BATCH))
+    body = join([kind.get(key)[mimetype] for key in keys], mimetype)
+    response = flask.Response(body, mimetype=mimetype)
+    if page is not None:
+        offset, total = page
+        response.headers["X-Total-Count"] = str(total)
+        if keys and offset + len(keys) < total:
+            args = flask.request.args.to_dict()
+            args["offset"] = offset + len(keys)
+            response.headers["Link"] = '<{}>; rel="next"'.format(
+                flask.url_for(".batch", name=name, **args))
+    return response
+
+@api.route("/<name>/<key>")
+def one(name, key):
+    kind = KINDS.get(name)
+    if kind is None:
+        flask.abort(404)
+    mimetype = negotiate()
+    try:
+        key = kind.parse(key)
+    except (KeyError, ValueError):
+        flask.abort(404)
+    if key not in kind:
+        flask.abort(404)
+    return flask.Response(kind.get(key)[mimetype], mimetype=mimetype)
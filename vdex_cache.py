@@ -0,0 +1,275 @@
+import collections
+import functools
+import gzip
+import hashlib
+import os
+import threading
+import time
+import flask
+import _vdex
+import vdex_static
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Caches whole rendered pages. Nothing a page shows can change while the
+# process runs, so an entry is only keyed by route and query string, and
+# its ETag comes from the version of the dex data, code and templates
+# rather than from the body: every worker and host agrees on it, and a
+# conditional GET for a stored page is answered without touching the body.
+
+PAGE_CACHE_SIZE = 4096
+
+def data_files(*sources):
+    return [os.environ.get("VDEX_SNAPSHOT") or _vdex.LIBRARY] \
+            + vdex_static.code_files(*sources)
+
+# The library or snapshot is large, so the hash of its contents is kept
+# next to it in <file>.sha256 and reused while its size and mtime stay the
+# same: it is computed once per deployment rather than in every worker.
+def data_digest(filename):
+    st = os.stat(filename)
+    stamp = "{}:{}".format(st.st_size, st.st_mtime_ns)
+    try:
+        with open(filename + ".sha256") as f:
+            saved, digest = f.read().split()
+        if saved == stamp:
+            return digest
+    except (OSError, ValueError):
+        pass
+    digest = vdex_static.file_hash(filename).hexdigest()
+    try:
+        vdex_static.write_atomic(filename + ".sha256",
+                "{} {}\n".format(stamp, digest).encode('utf-8'))
+    except OSError:
+        pass
+    return digest
+
+# Hashed from the contents of the files, so identical deployments agree on
+# it wherever they run. Code and templates are small and hashed directly.
+def version(app, *sources):
+    data, *code = data_files(*sources)
+    digest = hashlib.sha256(data_digest(data).encode('utf-8'))
+    files = code + [os.path.join(app.root_path, app.template_folder, name)
+            for name in sorted(app.jinja_loader.list_templates())]
+    mtime = os.stat(data).st_mtime
+    for filename in files:
+        vdex_static.file_hash(filename, digest)
+        mtime = max(mtime, os.stat(filename).st_mtime)
+    return digest.hexdigest(), mtime
+
+class Page:
+    def __init__(self, body, mimetype, etag, last_modified):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = etag
+        self.last_modified = last_modified
+        self.encoded = {"identity": body}
+
+    def encode(self, encoding):
+        if encoding not in self.encoded:
+            if encoding == "br":
+                self.encoded[encoding] = brotli.compress(self.body)
+            else:
+                self.encoded[encoding] = gzip.compress(self.body)
+        return self.encoded[encoding]
+
+class PageCache:
+    def __init__(self, app, *sources, maxsize=PAGE_CACHE_SIZE):
+        self.version, self.last_modified = version(app, *sources)
+        self.maxsize = maxsize
+        self.pages = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def key(self):
+        request = flask.request
+        return request.path + "?" + "&".join(sorted(
+            "{}={}".format(k, v) for k, v in request.args.items(multi=True)))
+
+    def etag(self, key):
+        return hashlib.sha256((self.version + key).encode('utf-8')) \
+                .hexdigest()[:32]
+
+    def get(self, key):
+        with self.lock:
+            page = self.pages.get(key)
+            if page is not None:
+                self.pages.move_to_end(key)
+                self.hits += 1
+            return page
+
+    def put(self, key, page):
+        with self.lock:
+            self.misses += 1
+            self.pages[key] = page
+            self.pages.move_to_end(key)
+            while len(self.pages) > self.maxsize:
+                self.pages.popitem(last=False)
+
+    def info(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "not_modified": self.not_modified,
+                    "currsize": len(self.pages), "maxsize": self.maxsize}
+
+    def headers(self, response, etag):
+        response.set_etag(etag)
+        response.last_modified = self.last_modified
+        response.vary.add("Accept-Encoding")
+        return response
+
+    def not_modified_response(self, etag):
+        with self.lock:
+            self.not_modified += 1
+        return self.headers(flask.Response(status=304), etag)
+
+    def encoding(self):
+        accept = flask.request.accept_encodings
+        if brotli is not None and accept["br"]:
+            return "br"
+        if accept["gzip"]:
+            return "gzip"
+        return "identity"
+
+    # Each content-coding is a different representation, so each gets its
+    # own strong validator.
+    @staticmethod
+    def encoded_etag(etag, encoding):
+        return etag if encoding == "identity" else etag + "-" + encoding
+
+    def respond(self, page, encoding):
+        response = flask.Response(page.encode(encoding),
+                mimetype=page.mimetype)
+        if encoding != "identity":
+            response.content_encoding = encoding
+        return self.headers(response, self.encoded_etag(page.etag, encoding))
+
+    # Streams the body as the view produces it and keeps a copy, stored as a
+    # page once the last chunk has been sent. A client that disconnects
+    # early leaves nothing behind.
+    def tee(self, key, response, etag):
+        chunks = response.response
+        def body():
+            sent = []
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                sent.append(chunk)
+                yield chunk
+            self.put(key, Page(b"".join(sent), response.mimetype, etag,
+                    self.last_modified))
+        response.response = body()
+        return self.headers(response, etag)
+
+    def cached(self, view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            request = flask.request
+            key = self.key()
+            etag = self.etag(key)
+            # Only a stored page is known to exist, so only it can be
+            # answered with a 304 (If-None-Match: * matches anything).
+            page = self.get(key)
+            encoding = self.encoding()
+            if page is not None:
+                tagged = self.encoded_etag(etag, encoding)
+                if request.if_none_match:
+                    if request.if_none_match.contains(tagged):
+                        return self.not_modified_response(tagged)
+                elif request.if_modified_since \
+                        and request.if_modified_since.timestamp() \
+                            >= int(self.last_modified):
+                    return self.not_modified_response(tagged)
+            else:
+                response = flask.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                # The first render of a streamed page is streamed; later
+                # requests are served from the stored copy.
+                if response.is_streamed:
+                    return self.tee(key, response, etag)
+                page = Page(response.get_data(), response.mimetype, etag,
+                        self.last_modified)
+                self.put(key, page)
+            return self.respond(page, encoding)
+        return wrapper
+
+# Caches computed results, such as team ratings, by a canonical key. Entries
+# expire after ttl seconds and the least recently used are evicted past
+# maxsize. Concurrent requests for a key that is being computed wait for
+# that computation instead of repeating it.
+
+RESULT_CACHE_SIZE = 1024
+RESULT_TTL = 3600.0
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+class ResultCache:
+    def __init__(self, maxsize=RESULT_CACHE_SIZE, ttl=RESULT_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = collections.OrderedDict()
+        self.flights = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, compute):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > time.monotonic():
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self.entries[key]
+                self.expirations += 1
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = _Flight()
+                self.misses += 1
+            else:
+                self.shared += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        try:
+            flight.value = compute()
+        except Exception as e:
+            flight.error = e
+            raise
+        else:
+            with self.lock:
+                self.entries[key] = (time.monotonic() + self.ttl, flight.value)
+                while len(self.entries) > self.maxsize:
+                    self.entries.popitem(last=False)
+                    self.evictions += 1
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+        return flight.value
+
+    def info(self):
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "shared": self.shared, "evictions": self.evictions,
+                    "expirations": self.expirations,
+                    "currsize": len(self.entries), "maxsize": self.maxsize,
+                    "ttl": self.ttl}
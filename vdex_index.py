@@ -0,0 +1,180 @@
+import bisect
+import numpy
+import _vdex
+
+# Bitmap indexes over the move details. A set of moves is a Python int with
+# bit i set for move i, so combining predicates is a chain of & and |, each
+# over a dozen machine words. Numeric attributes keep one "value <= v" bitmap
+# per distinct value, so a range is at most two lookups and an and-not.
+
+CATEGORIES = {
+        "type": ("typ", _vdex.type_name),
+        "class": ("damage_class", _vdex.damage_class_name),
+        "gen": ("generation", _vdex.generation_name),
+        "target": ("target", _vdex.move_target_name),
+        "effect": ("effect", _vdex.move_effect_name),
+        "category": ("category", _vdex.move_category_name),
+        "ailment": ("ailment", _vdex.ailment_name),
+        }
+
+RANGES = {
+        "power": "power",
+        "accuracy": "accuracy",
+        "pp": "pp",
+        "priority": "priority",
+        "gen": "generation",
+        }
+
+SORT_KEYS = ["id", "name", "power", "accuracy", "pp", "priority", "gen"]
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 1000
+
+class QueryError (ValueError):
+    pass
+
+def bits(mask):
+    ids = []
+    while mask:
+        low = mask & -mask
+        ids.append(low.bit_length() - 1)
+        mask ^= low
+    return ids
+
+class Range:
+    def __init__(self, values):
+        self.values = sorted(set(values))
+        self.at_most = []
+        cumulative = 0
+        for value in self.values:
+            for move, v in enumerate(values):
+                if v == value:
+                    cumulative |= 1 << move
+            self.at_most.append(cumulative)
+
+    # Moves with low <= value <= high; either bound may be None.
+    def select(self, low, high):
+        mask = self.at_most[-1] if self.values else 0
+        if high is not None:
+            i = bisect.bisect_right(self.values, high)
+            mask = self.at_most[i - 1] if i else 0
+        if low is not None:
+            i = bisect.bisect_left(self.values, low)
+            if i:
+                mask &= ~self.at_most[i - 1]
+        return mask
+
+class MoveIndex:
+    def __init__(self, details=None):
+        if details is None:
+            details = _vdex.move_details_all()
+        self.count = len(details)
+        self.all = (1 << self.count) - 1
+        self.names = _vdex.move_names()
+        self.categories = {}
+        for arg, (field, name) in CATEGORIES.items():
+            masks = self.categories[arg] = {}
+            for move, d in enumerate(details):
+                key = name(getattr(d, field)).lower()
+                masks[key] = masks.get(key, 0) | 1 << move
+        self.flags = {}
+        for flag in _vdex.MOVE_FLAG:
+            bit = getattr(_vdex, "MOVE_FLAG_" + flag)
+            self.flags[flag.lower()] = sum(1 << move
+                    for move, d in enumerate(details) if d.flags & bit)
+        self.stats = {}
+        for index, stat in enumerate(_vdex.STAT_CHANGE):
+            self.stats[stat.lower()] = sum(1 << move
+                    for move, d in enumerate(details) if d.stat_changes[index])
+        columns = dict((arg, [getattr(d, field) for d in details])
+                for arg, field in RANGES.items())
+        # Generations are numbered from 1, as in /moves/?gen=.
+        columns["gen"] = [generation + 1 for generation in columns["gen"]]
+        self.ranges = dict((arg, Range(values))
+                for arg, values in columns.items())
+        columns["id"] = list(range(self.count))
+        columns["name"] = [name.lower() for name in self.names]
+        self.columns = columns
+
+    def _lookup(self, table, arg, value):
+        try:
+            return table[value.lower()]
+        except KeyError:
+            raise QueryError("Unknown {}: {}".format(arg, value))
+
+    # Terms of one argument are or-ed, except flags, which must all be set.
+    def select(self, args):
+        mask = self.all
+        for arg, table in self.categories.items():
+            if arg in args:
+                mask &= self._or(table, arg, args[arg])
+        if "flag" in args:
+            for value in args["flag"]:
+                mask &= self._lookup(self.flags, "flag", value)
+        if "stat" in args:
+            mask &= self._or(self.stats, "stat", args["stat"])
+        for arg, index in self.ranges.items():
+            low = args.get(arg + "_min")
+            high = args.get(arg + "_max")
+            if low is not None or high is not None:
+                mask &= index.select(low, high)
+        return mask
+
+    def _or(self, table, arg, values):
+        mask = 0
+        for value in values:
+            mask |= self._lookup(table, arg, value)
+        return mask
+
+    def search(self, args, sort="id", limit=DEFAULT_LIMIT, offset=0):
+        descending = sort.startswith("-")
+        key = sort.lstrip("-")
+        if key not in SORT_KEYS:
+            raise QueryError("Unknown sort key: {}".format(key))
+        if not 0 <= limit <= MAX_LIMIT or offset < 0:
+            raise QueryError("Bad limit or offset")
+        moves = bits(self.select(args))
+        if key != "id" or descending:
+            column = self.columns[key]
+            moves.sort(key=lambda move: (column[move], move),
+                    reverse=descending)
+        return len(moves), moves[offset:offset + limit]
+
+# Posting lists of who learns each move. The learners come sorted by
+# (move, version group), so the postings for a pair are one slice, found by
+# binary search on a packed key.
+
+class LearnerIndex:
+    def __init__(self, learners=None, counts=None):
+        if learners is None:
+            learners = _vdex.learners_all()
+        if counts is None:
+            counts = _vdex.pokemon_count_all()
+        learners = numpy.ctypeslib.as_array(learners)
+        self.keys = self.key(learners["mov"], learners["vg"])
+        self.pokemon = learners["pokemon"]
+        self.learn_method = learners["learn_method"]
+        self.level = learners["level"]
+        counts = numpy.asarray(counts, dtype=numpy.int64)
+        self.species = numpy.repeat(numpy.arange(len(counts)), counts)
+        self.index = numpy.arange(counts.sum()) \
+                - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+
+    @staticmethod
+    def key(move, vg):
+        return numpy.asarray(move, dtype=numpy.int64) << 8 \
+                | numpy.asarray(vg, dtype=numpy.int64)
+
+    def span(self, move, vg):
+        key = self.key(move, vg)
+        return (int(numpy.searchsorted(self.keys, key, "left")),
+                int(numpy.searchsorted(self.keys, key, "right")))
+
+    # (species, pokemon index, learn method, level) for each posting.
+    def learners(self, move, vg):
+        start, end = self.span(move, vg)
+        pokemon = self.pokemon[start:end]
+        return list(zip(self.species[pokemon].tolist(),
+                self.index[pokemon].tolist(),
+                self.learn_method[start:end].tolist(),
+                self.level[start:end].tolist()))
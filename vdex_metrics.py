@@ -0,0 +1,155 @@
+import bisect
+import threading
+import time
+import flask
+
+# Metrics in the Prometheus text format. Request timings are always kept
+# for the apps passed to install(). FFI calls are only timed when _vdex was
+# imported with VDEX_INSTRUMENT set, which makes it wrap every binding with
+# instrument() as it binds them; each call is also counted against the
+# endpoint of the request that made it.
+
+FFI_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 1e-3,
+        1e-2, 0.1, 1.0)
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+        1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+_lock = threading.Lock()
+_current = threading.local()
+
+FFI = {}
+FFI_BY_ENDPOINT = {}
+# "string" is the bytes of names the library allocated one at a time, each
+# freed as soon as it is copied; "table" is the bytes decoded from name
+# tables.
+NAME_BYTES = {"string": 0, "table": 0}
+REQUESTS = {}
+
+def instrument(name, f):
+    name = name.lstrip("_")
+    with _lock:
+        histogram = FFI.setdefault(name, Histogram(FFI_BUCKETS))
+    perf_counter = time.perf_counter
+    def call(*args):
+        start = perf_counter()
+        try:
+            return f(*args)
+        finally:
+            elapsed = perf_counter() - start
+            key = (getattr(_current, "endpoint", None), name)
+            with _lock:
+                histogram.observe(elapsed)
+                FFI_BY_ENDPOINT[key] = FFI_BY_ENDPOINT.get(key, 0) + 1
+    call.__name__ = name
+    call.__wrapped__ = f
+    return call
+
+def name_bytes(kind, count):
+    with _lock:
+        NAME_BYTES[kind] += count
+
+# Flask
+
+def _before():
+    _current.endpoint = flask.request.endpoint
+    flask.g.metrics_start = time.perf_counter()
+
+def _after(response):
+    flask.g.metrics_status = response.status_code
+    return response
+
+# Runs after a streamed response has been sent, so its time is included.
+def _teardown(error):
+    start = flask.g.pop("metrics_start", None)
+    if start is not None:
+        elapsed = time.perf_counter() - start
+        status = flask.g.pop("metrics_status", 500)
+        key = (flask.current_app.name, flask.request.endpoint,
+                flask.request.method, status)
+        with _lock:
+            histogram = REQUESTS.get(key)
+            if histogram is None:
+                histogram = REQUESTS[key] = Histogram(REQUEST_BUCKETS)
+            histogram.observe(elapsed)
+    _current.endpoint = None
+
+def _labels(**labels):
+    return ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\")
+            .replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in labels.items())
+
+def _histogram(lines, name, labels, histogram):
+    cumulative = 0
+    for bound, count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+        cumulative += count
+        lines.append("{}_bucket{{{},le=\"{}\"}} {}".format(name, labels,
+            bound, cumulative))
+    lines.append("{}_sum{{{}}} {}".format(name, labels, histogram.sum))
+    lines.append("{}_count{{{}}} {}".format(name, labels, histogram.count))
+
+# info returns {group: {field: number}} and is exported as gauges, e.g.
+# for cache statistics.
+def render(info=None):
+    import _vdex
+    with _lock:
+        lines = ["# HELP vdex_library_info The vdex library that was loaded.",
+                "# TYPE vdex_library_info gauge",
+                "vdex_library_info{{{}}} 1".format(_labels(build=_vdex.BUILD,
+                    path=_vdex.LIBRARY))]
+        lines += ["# HELP vdex_ffi_instrumented Whether FFI calls are timed.",
+                "# TYPE vdex_ffi_instrumented gauge",
+                "vdex_ffi_instrumented {}".format(
+                    int(_vdex._metrics is not None))]
+        lines += ["# HELP vdex_ffi_call_seconds FFI call latency.",
+                "# TYPE vdex_ffi_call_seconds histogram"]
+        for name, histogram in sorted(FFI.items()):
+            if histogram.count:
+                _histogram(lines, "vdex_ffi_call_seconds",
+                        _labels(function=name), histogram)
+        lines += ["# HELP vdex_ffi_calls_total FFI calls by request endpoint.",
+                "# TYPE vdex_ffi_calls_total counter"]
+        for (endpoint, name), count in sorted(FFI_BY_ENDPOINT.items(),
+                key=lambda item: (str(item[0][0]), item[0][1])):
+            lines.append("vdex_ffi_calls_total{{{}}} {}".format(_labels(
+                endpoint=endpoint or "", function=name), count))
+        lines += ["# HELP vdex_name_bytes_total Bytes of names decoded from "
+                    "the library.",
+                "# TYPE vdex_name_bytes_total counter"]
+        for kind, count in sorted(NAME_BYTES.items()):
+            lines.append("vdex_name_bytes_total{{{}}} {}".format(
+                _labels(kind=kind), count))
+        lines += ["# HELP vdex_http_request_seconds Request latency.",
+                "# TYPE vdex_http_request_seconds histogram"]
+        for (app, endpoint, method, status), histogram \
+                in sorted(REQUESTS.items(), key=str):
+            _histogram(lines, "vdex_http_request_seconds", _labels(app=app,
+                endpoint=endpoint or "", method=method, status=status),
+                histogram)
+    for group, values in sorted((info() if info else {}).items()):
+        for field, value in sorted(values.items()):
+            if isinstance(value, (int, float)):
+                name = "vdex_{}_{}".format(group, field)
+                lines += ["# TYPE {} gauge".format(name),
+                        "{} {}".format(name, value)]
+    return "\n".join(lines) + "\n"
+
+def install(app, info=None):
+    app.before_request(_before)
+    app.after_request(_after)
+    app.teardown_request(_teardown)
+    def metrics():
+        return flask.Response(render(info),
+                mimetype="text/plain; version=0.0.4")
+    app.add_url_rule("/metrics", "metrics", metrics)
@@ -0,0 +1,91 @@
+import collections.abc
+import numpy
+import threading
+import _vdex
+
+# Movesets are kept packed, six bytes an entry, and sorted the way the
+# pages list them. Consecutive version groups mostly share learnsets, so
+# each distinct learnset is stored once, keyed by its bytes, and every
+# (pokemon, version group) with the same content points at it. Tuples for
+# the templates are only built while a moveset is iterated.
+
+ENTRY = numpy.dtype([
+        ("learn_method", numpy.uint8),
+        ("level", numpy.uint8),
+        ("mov", numpy.uint16),
+        ("index", numpy.uint16),
+        ])
+
+def pack(raw):
+    raw = numpy.frombuffer(bytes(raw), numpy.dtype(_vdex.MovesetEntry))
+    entries = numpy.zeros(len(raw), ENTRY)
+    entries["learn_method"] = raw["learn_method"]
+    entries["level"] = raw["level"]
+    entries["mov"] = raw["mov"]
+    entries["index"] = numpy.arange(len(raw))
+    order = numpy.lexsort((entries["index"], entries["level"],
+        entries["learn_method"]))
+    return entries[order].tobytes()
+
+class Moveset:
+    __slots__ = ("entries", "moves")
+
+    def __init__(self, data, moves):
+        self.entries = numpy.frombuffer(data, ENTRY)
+        self.moves = moves
+
+    def __len__(self):
+        return len(self.entries)
+
+    # (learn method, learn method name, level, index, move)
+    def __iter__(self):
+        moves = self.moves
+        for learn_method, level, mov, index in self.entries.tolist():
+            yield (learn_method, _vdex.learn_method_name(learn_method),
+                    level, index, moves[mov])
+
+class MovesetStore:
+    def __init__(self, moves):
+        self.moves = moves
+        self.shared = {}
+        self.movesets = {}
+        self.lock = threading.Lock()
+
+    def get(self, species, index, vg):
+        key = (species, index, vg)
+        moveset = self.movesets.get(key)
+        if moveset is None:
+            data = pack(_vdex.moveset(_vdex.pokemon(species, index), vg))
+            with self.lock:
+                moveset = self.shared.get(data)
+                if moveset is None:
+                    moveset = self.shared[data] = Moveset(data, self.moves)
+                self.movesets[key] = moveset
+        return moveset
+
+    def info(self):
+        with self.lock:
+            return {"movesets": len(self.movesets),
+                    "distinct": len(self.shared),
+                    "bytes": sum(m.entries.nbytes
+                        for m in self.shared.values())}
+
+# The movesets of one Pokemon by version group name, loaded on first access.
+class Movesets (collections.abc.Mapping):
+    VERSION_GROUPS = dict((_vdex.version_group_name(vg), vg)
+            for vg in _vdex.version_group_list())
+
+    def __init__(self, store, species, index):
+        self.store = store
+        self.species = species
+        self.index = index
+
+    def __getitem__(self, name):
+        return self.store.get(self.species, self.index,
+                self.VERSION_GROUPS[name])
+
+    def __iter__(self):
+        return iter(self.VERSION_GROUPS)
+
+    def __len__(self):
+        return len(self.VERSION_GROUPS)
@@ -0,0 +1,137 @@
+import bisect
+import unicodedata
+from functools import lru_cache
+import _vdex
+
+# Looks names up loosely. Keys are normalized (accents, case, spaces and
+# punctuation dropped), so "mr mime" finds "Mr. Mime". Prefixes are a range
+# of a sorted key array. Misspellings are found with a deletion index: every
+# key is stored under each string reachable by deleting up to MAX_DISTANCE
+# characters, so the keys within that edit distance of a query are among
+# those sharing one of the query's own deletions, and only those few are
+# checked with a real edit distance. A query longer than every key by more
+# than the distance cannot match, so its deletions are never built.
+
+MAX_DISTANCE = 2
+
+# resolve() allows one edit per this many characters of the name, so short
+# names must be exact.
+CHARS_PER_EDIT = 3
+
+DEFAULT_LIMIT = 10
+
+def normalize(name):
+    name = unicodedata.normalize("NFKD", name)
+    return "".join(c for c in name.lower() if c.isalnum())
+
+def deletions(key, distance):
+    found = {key}
+    frontier = [key]
+    for _ in range(distance):
+        frontier = {s[:i] + s[i + 1:] for s in frontier for i in range(len(s))}
+        found.update(frontier)
+    return found
+
+# Levenshtein distance, or limit + 1 once it is known to exceed limit.
+def distance(a, b, limit):
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return min(previous[-1], limit + 1)
+
+class UnknownName (KeyError):
+    pass
+
+class NameIndex:
+    def __init__(self, names):
+        self.names = {}
+        self.exact = {}
+        for i, name in names:
+            key = normalize(name)
+            if key and key not in self.exact:
+                self.exact[key] = i
+                self.names[i] = name
+        self.keys = sorted(self.exact)
+        self.longest = max(map(len, self.keys), default=0)
+        self.deleted = {}
+        for key in self.keys:
+            for deleted in deletions(key, MAX_DISTANCE):
+                self.deleted.setdefault(deleted, []).append(key)
+
+    def prefix(self, query, limit=DEFAULT_LIMIT):
+        query = normalize(query)
+        start = bisect.bisect_left(self.keys, query)
+        matches = []
+        for key in self.keys[start:start + limit]:
+            if not key.startswith(query):
+                break
+            matches.append(self.exact[key])
+        return matches
+
+    # [(distance, id)], nearest first.
+    def fuzzy(self, query, limit=DEFAULT_LIMIT, max_distance=MAX_DISTANCE):
+        query = normalize(query)
+        if len(query) > self.longest + max_distance:
+            return []
+        candidates = set()
+        for deleted in deletions(query, max_distance):
+            candidates.update(self.deleted.get(deleted, ()))
+        matches = []
+        for key in candidates:
+            d = distance(query, key, max_distance)
+            if d <= max_distance:
+                matches.append((d, key))
+        matches.sort()
+        return [(d, self.exact[key]) for d, key in matches[:limit]]
+
+    # Exact, then the single nearest name within MAX_DISTANCE, or less for
+    # short names.
+    def resolve(self, name):
+        key = normalize(name)
+        if key in self.exact:
+            return self.exact[key]
+        max_distance = min(MAX_DISTANCE, len(key) // CHARS_PER_EDIT)
+        matches = self.fuzzy(name, 2, max_distance) if max_distance else []
+        if not matches or (len(matches) > 1 and matches[0][0] == matches[1][0]):
+            raise UnknownName(name)
+        return matches[0][1]
+
+def _items():
+    return [(item, name) for item, name in enumerate(_vdex.item_names())
+            if name]
+
+KINDS = {
+        "species": lambda: enumerate(_vdex.species_names()),
+        "moves": lambda: enumerate(_vdex.move_names()),
+        "items": _items,
+        }
+
+@lru_cache(maxsize=None)
+def index(kind):
+    return NameIndex(KINDS[kind]())
+
+def resolve(kind, name):
+    return index(kind).resolve(name)
+
+# [(kind, id, name)], prefix matches first.
+def autocomplete(query, kinds=tuple(KINDS), limit=DEFAULT_LIMIT):
+    results = []
+    for kind in kinds:
+        idx = index(kind)
+        results.extend((kind, i, idx.names[i]) for i in idx.prefix(query, limit))
+    if len(results) < limit and len(normalize(query)) > MAX_DISTANCE:
+        fuzzy = sorted((d, kind, i) for kind in kinds
+                for d, i in index(kind).fuzzy(query, limit))
+        seen = set((kind, i) for kind, i, _ in results)
+        for _, kind, i in fuzzy:
+            if (kind, i) not in seen:
+                results.append((kind, i, index(kind).names[i]))
+    return results[:limit]
@@ -0,0 +1,172 @@
+import math
+import numpy
+import time
+import _vdex
+import vdex_rating
+
+# Branch-and-bound team search. A partial team is (covered, totals, rating):
+# the types it hits super-effectively, the per-type sums of
+# 5 * offense + resistance, and the sum of its members' ratings. Candidates
+# are tried best-rated first and every bound only shrinks further down the
+# candidate list, so the first branch that cannot beat the incumbent ends
+# its loop.
+
+DEFAULT_BUDGET = 10.0
+
+class _OutOfTime (Exception):
+    pass
+
+# Same value as vdex_web3.modified_rating for the team.
+def modified_rating(covered, totals, rating):
+    negatives = int(numpy.maximum(-totals, 0).sum())
+    modr = rating
+    if rating > 0:
+        modr += (int(covered) * rating) // _vdex.TYPE_COUNT
+        modr //= negatives + 1
+    return (modr,)
+
+# Same ordering as vdex_test.score_team.
+def score_team(covered, totals, rating):
+    mintotal = int(totals.min())
+    return (mintotal, -int((totals == mintotal).sum()), int(totals.sum()))
+
+OBJECTIVES = {
+        "modified_rating": modified_rating,
+        "score_team": score_team,
+        }
+
+class Search:
+    def __init__(self, size, objective="modified_rating", maxgen=None,
+            include=(), budget=DEFAULT_BUDGET, weights=vdex_rating.WEIGHTS):
+        if objective not in OBJECTIVES:
+            raise ValueError("Unknown objective: {}".format(objective))
+        if not math.isfinite(budget) or budget <= 0:
+            raise ValueError("Budget must be a positive number of seconds")
+        if size < 1:
+            raise ValueError("Team size must be at least 1")
+        include = list(dict.fromkeys(include))
+        if len(include) > size:
+            raise ValueError("More required species than team slots")
+        features = vdex_rating.features()
+        ratings = vdex_rating.ratings(weights)
+        if maxgen is None:
+            maxgen = _vdex.GENERATION_COUNT - 1
+        generations = range(maxgen + 1)
+        mask = features.in_generations(generations) \
+                & ~features.pre_evolutions(generations)
+        mask[include] = False
+        candidates = mask.nonzero()[0]
+        order = numpy.argsort(-ratings.rating[candidates], kind="stable")
+        self.size = size
+        self.objective = objective
+        self.score = OBJECTIVES[objective]
+        self.include = include
+        self.budget = budget
+        self.candidates = candidates = candidates[order]
+        self.offense = ratings.offense[candidates].astype(bool)
+        self.values = (5 * ratings.offense + ratings.resistance)[candidates] \
+                .astype(numpy.int64)
+        self.ratings = ratings.rating[candidates].astype(numpy.int64)
+        # Per suffix of the candidate list: the union of its coverage and
+        # the sums of its k best values per type and k best ratings. Built
+        # from the end, each suffix adding one candidate to the previous
+        # one's top k, so this is linear in the number of candidates.
+        remaining = size - len(include)
+        n = len(candidates)
+        self.cover = numpy.zeros((n + 1, _vdex.TYPE_COUNT), dtype=bool)
+        self.best_values = [None] * n
+        self.best_ratings = [None] * n
+        top_values = self.values[:0]
+        top_ratings = self.ratings[:0]
+        for i in range(n - 1, -1, -1):
+            self.cover[i] = self.cover[i + 1] | self.offense[i]
+            top_values = numpy.sort(numpy.vstack((top_values,
+                self.values[i])), axis=0)[::-1][:remaining]
+            top_ratings = numpy.sort(numpy.append(top_ratings,
+                self.ratings[i]))[::-1][:remaining]
+            self.best_values[i] = top_values.cumsum(axis=0)
+            self.best_ratings[i] = top_ratings.cumsum()
+        rated = 5 * ratings.offense + ratings.resistance
+        self.start = (ratings.offense[include].astype(bool).any(axis=0),
+                rated[include].sum(axis=0).astype(numpy.int64),
+                int(ratings.rating[include].sum()))
+        self.best = None
+        self.nodes = 0
+        self.deadline = None
+
+    def bound(self, state, i, remaining):
+        covered, totals, rating = state
+        totals = totals + self.best_values[i][remaining - 1]
+        if self.objective == "score_team":
+            # A team reaching the bound's minimum has at least one type at
+            # that minimum.
+            return (int(totals.min()), -1, int(totals.sum()))
+        rating += int(self.best_ratings[i][remaining - 1])
+        covered = int((covered | self.cover[i]).sum())
+        return modified_rating(covered, totals, rating)
+
+    def evaluate(self, state):
+        covered, totals, rating = state
+        return self.score(int(covered.sum()), totals, rating)
+
+    def offer(self, state, team):
+        score = self.evaluate(state)
+        if self.best is None or score > self.best[0]:
+            self.best = (score, tuple(team))
+
+    def add(self, state, i):
+        covered, totals, rating = state
+        return (covered | self.offense[i], totals + self.values[i],
+                rating + int(self.ratings[i]))
+
+    # Pick the best next member one at a time, for an initial incumbent.
+    def greedy(self):
+        state, team, used = self.start, [], set()
+        for _ in range(self.size - len(self.include)):
+            choices = [(self.evaluate(self.add(state, i)), -i)
+                    for i in range(len(self.candidates)) if i not in used]
+            if not choices:
+                return
+            i = -max(choices)[1]
+            used.add(i)
+            team.append(i)
+            state = self.add(state, i)
+        self.offer(state, team)
+
+    def extend(self, state, team, start, remaining):
+        self.nodes += 1
+        if self.nodes % 1024 == 0 and time.perf_counter() > self.deadline:
+            raise _OutOfTime()
+        if remaining == 0:
+            self.offer(state, team)
+            return
+        for i in range(start, len(self.candidates) - remaining + 1):
+            if self.best is not None \
+                    and self.bound(state, i, remaining) <= self.best[0]:
+                break
+            team.append(i)
+            self.extend(self.add(state, i), team, i + 1, remaining - 1)
+            team.pop()
+
+    def run(self):
+        started = time.perf_counter()
+        self.deadline = started + self.budget
+        self.greedy()
+        optimal = True
+        try:
+            self.extend(self.start, [], 0, self.size - len(self.include))
+        except _OutOfTime:
+            optimal = False
+        if self.best is None:
+            return None
+        score, team = self.best
+        return {"team": self.include
+                    + [int(self.candidates[i]) for i in team],
+                "score": list(score),
+                "optimal": optimal,
+                "nodes": self.nodes,
+                "elapsed": time.perf_counter() - started}
+
+def optimize(size, objective="modified_rating", maxgen=None, include=(),
+        budget=DEFAULT_BUDGET, weights=vdex_rating.WEIGHTS):
+    return Search(size, objective, maxgen, include, budget, weights).run()
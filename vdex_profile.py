@@ -0,0 +1,148 @@
+import collections
+import hmac
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+import flask
+import _vdex
+
+# Startup phases and an on-demand sampling profiler.
+#
+# Module-level builds in the apps are wrapped in Startup.phase(), and
+# report() logs how long each took and how resident memory grew, at INFO on
+# the "vdex.startup" logger. The profiler samples the stacks of every other thread in
+# the worker from inside the request that asked for it, and answers with
+# collapsed stacks ("frame;frame;frame count" lines) for flamegraph.pl or
+# speedscope. It therefore needs a threaded worker (e.g. gunicorn --threads
+# or gthread); a worker with no other thread gets a 501 straight away. Both
+# admin routes only exist when VDEX_ADMIN_TOKEN is set, and need it as a
+# bearer token.
+
+DEFAULT_INTERVAL = 0.005
+MAX_SECONDS = 60.0
+
+def rss():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+# Logs at INFO even when the root logger is at WARNING, and to stderr when
+# nothing else handles it, so the report shows on boot under flask run and
+# gunicorn alike. Set its level or handlers to quiet it.
+def startup_logger():
+    logger = logging.getLogger("vdex.startup")
+    if logger.level == logging.NOTSET:
+        logger.setLevel(logging.INFO)
+    if not logger.hasHandlers():
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+    return logger
+
+Phase = collections.namedtuple("Phase", "name seconds rss_before rss_after")
+
+def _mib(size):
+    return "?" if size is None else "{:.1f}".format(size / 2**20)
+
+class Startup:
+    def __init__(self, title):
+        self.title = title
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name):
+        before = rss()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append(Phase(name, time.perf_counter() - start,
+                before, rss()))
+
+    def report(self, logger=None):
+        logger = logger or startup_logger()
+        logger.info("%s startup (%s build, %s):", self.title, _vdex.BUILD,
+                _vdex.LIBRARY)
+        for p in self.phases:
+            logger.info("  %-24s %9.1f ms  RSS %7s -> %7s MiB", p.name,
+                    1000 * p.seconds, _mib(p.rss_before), _mib(p.rss_after))
+        logger.info("  %-24s %9.1f ms  RSS %7s MiB", "total",
+                1000 * sum(p.seconds for p in self.phases), _mib(rss()))
+
+# Sampling
+
+def _frame_name(frame):
+    code = frame.f_code
+    return "{}:{}".format(os.path.basename(code.co_filename), code.co_name)
+
+def sample(seconds, interval=DEFAULT_INTERVAL):
+    me = threading.get_ident()
+    counts = collections.Counter()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        names = dict((t.ident, t.name) for t in threading.enumerate())
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            stack.append(names.get(ident, "thread-{}".format(ident)))
+            counts[";".join(reversed(stack))] += 1
+        time.sleep(interval)
+    return counts
+
+def collapsed(counts):
+    return "".join("{} {}\n".format(stack, count)
+            for stack, count in counts.most_common())
+
+# Flask
+
+_profiling = threading.Lock()
+
+def _authorized(token):
+    header = flask.request.headers.get("Authorization", "")
+    given = header[len("Bearer "):] if header.startswith("Bearer ") else ""
+    return hmac.compare_digest(given.encode(), token.encode())
+
+def install(app, startup=None):
+    token = os.environ.get("VDEX_ADMIN_TOKEN")
+    if not token:
+        return
+    def admin(view):
+        def wrapper():
+            if not _authorized(token):
+                flask.abort(403)
+            return view()
+        wrapper.__name__ = view.__name__
+        return wrapper
+    @admin
+    def startup_report():
+        return flask.jsonify(title=startup.title if startup else app.name,
+                library=_vdex.LIBRARY, build=_vdex.BUILD,
+                rss=rss(), phases=[p._asdict()
+                    for p in (startup.phases if startup else [])])
+    @admin
+    def profile():
+        seconds = flask.request.args.get("seconds", 10.0, type=float)
+        interval = flask.request.args.get("interval", DEFAULT_INTERVAL,
+                type=float)
+        if not 0 < seconds <= MAX_SECONDS or not 0 < interval <= 1:
+            flask.abort(400)
+        if threading.active_count() < 2:
+            flask.abort(501, "Profiling needs a threaded worker")
+        if not _profiling.acquire(blocking=False):
+            flask.abort(409)
+        try:
+            counts = sample(seconds, interval)
+        finally:
+            _profiling.release()
+        return flask.Response(collapsed(counts), mimetype="text/plain")
+    app.add_url_rule("/admin/startup", "admin_startup", startup_report)
+    app.add_url_rule("/admin/profile", "admin_profile", profile)
@@ -0,0 +1,135 @@
+import numpy
+import _vdex
+from collections import namedtuple
+from functools import lru_cache
+
+# Damage multipliers in quarters, indexed by efficacy + 2.
+MULTIPLIER = numpy.array([0, 2, 4, 8], dtype=numpy.int16)
+
+EFFICACY_RATING = { 0: 4, 1: 3, 2: 2, 4: 0, 8: -4, 16: -6 }
+
+# rating = offense * sum(offense) + resistance * sum(resistance)
+#        + stats * sum(stats) + base
+Weights = namedtuple("Weights", "offense resistance stats base efficacy_rating")
+
+WEIGHTS = Weights(30, 6, 1, -400, tuple(sorted(EFFICACY_RATING.items())))
+
+NO_IMMUNITY = -1
+
+GROUND_TYPE = 4
+LEVITATE = 26
+
+FIRE_TYPE = 9
+FLASH_FIRE = 18
+
+WATER_TYPE = 10
+WATER_ABSORB = 11
+
+ELECTRIC_TYPE = 12
+VOLT_ABSORB = 10
+
+# Checked in order; the first matching ability wins.
+IMMUNITIES = [
+        (LEVITATE, GROUND_TYPE),
+        (FLASH_FIRE, FIRE_TYPE),
+        (WATER_ABSORB, WATER_TYPE),
+        (VOLT_ABSORB, ELECTRIC_TYPE),
+        ]
+
+def rating_table(efficacy_rating=EFFICACY_RATING):
+    efficacy_rating = dict(efficacy_rating)
+    table = numpy.zeros(max(efficacy_rating) + 1, dtype=numpy.int16)
+    for quarters, rating in efficacy_rating.items():
+        table[quarters] = rating
+    return table
+
+def get_immunities(ability1, ability2):
+    immunity = numpy.full(len(ability1), NO_IMMUNITY, dtype=numpy.int16)
+    for ability, typ in reversed(IMMUNITIES):
+        immunity[(ability1 == ability) | (ability2 == ability)] = typ
+    return immunity
+
+# Each kernel rates N Pokemon at once and returns an N x TYPE_COUNT array.
+# type2 is ignored where has_type2 is false.
+
+def rate_offense(type1, type2, has_type2):
+    super_effective = _vdex.efficacy_matrix() > 0
+    offense = super_effective[type1] | (super_effective[type2]
+            & numpy.asarray(has_type2, dtype=bool)[:, None])
+    return offense.astype(numpy.int16)
+
+def rate_resistance(type1, type2, has_type2, immunity=None,
+        efficacy_rating=EFFICACY_RATING):
+    # Indexed [target, damage].
+    quarters = MULTIPLIER[_vdex.efficacy_matrix().T + 2]
+    efficacies = numpy.where(numpy.asarray(has_type2, dtype=bool)[:, None],
+            quarters[type1] * quarters[type2] // 4, quarters[type1])
+    if immunity is not None:
+        immune = numpy.nonzero(immunity != NO_IMMUNITY)[0]
+        efficacies[immune, immunity[immune]] = 0
+    return rating_table(efficacy_rating)[efficacies]
+
+# Feature Store
+
+# Fixed-width columns indexed by species id, describing each species'
+# default form. Loaded with a handful of bulk FFI calls.
+class Features:
+    def __init__(self):
+        species = numpy.ctypeslib.as_array(_vdex.species_details_all())
+        pokemon = numpy.ctypeslib.as_array(_vdex.default_pokemon_details_all())
+        self.count = len(species)
+        self.generation = species["generation"].astype(numpy.uint8)
+        self.evolved = species["evolved"].astype(bool)
+        self.evolves_from = species["evolves_from"]["from_id"].astype(numpy.uint16)
+        self.type1 = pokemon["type1"].astype(numpy.uint8)
+        self.type2 = pokemon["type2"].astype(numpy.uint8)
+        self.has_type2 = pokemon["has_type2"].astype(bool)
+        self.ability1 = pokemon["ability1"].astype(numpy.uint8)
+        self.ability2 = pokemon["ability2"].astype(numpy.uint8)
+        self.has_ability2 = pokemon["has_ability2"].astype(bool)
+        self.hidden_ability = pokemon["hidden_ability"].astype(numpy.uint8)
+        self.has_hidden_ability = pokemon["has_hidden_ability"].astype(bool)
+        self.stats = pokemon["stats"].astype(numpy.uint8)
+        self.immunity = get_immunities(self.ability1, self.ability2)
+
+    def in_generations(self, generations):
+        return numpy.isin(self.generation, list(generations))
+
+    # Species that evolve into another species, both from the given
+    # generations.
+    def pre_evolutions(self, generations):
+        evolves = self.evolved & self.in_generations(generations) \
+                & self.in_generations(generations)[self.evolves_from]
+        mask = numpy.zeros(self.count, dtype=bool)
+        mask[self.evolves_from[evolves]] = True
+        return mask
+
+@lru_cache(maxsize=None)
+def features():
+    return Features()
+
+class Ratings:
+    def __init__(self, features, weights):
+        self.weights = weights
+        self.stats = features.stats
+        self.offense = rate_offense(features.type1, features.type2,
+                features.has_type2)
+        self.resistance = rate_resistance(features.type1, features.type2,
+                features.has_type2, features.immunity, weights.efficacy_rating)
+        self.rating = (weights.offense * self.offense.sum(axis=1, dtype=int)
+                + weights.resistance * self.resistance.sum(axis=1, dtype=int)
+                + weights.stats * self.stats.sum(axis=1, dtype=int)
+                + weights.base)
+
+    def rate(self, species):
+        return {"offense": self.offense[species].tolist(),
+                "resistance": self.resistance[species].tolist(),
+                "stats": self.stats[species].tolist(),
+                "rating": int(self.rating[species])}
+
+@lru_cache(maxsize=None)
+def ratings(weights=WEIGHTS):
+    return Ratings(features(), weights)
+
+def rate(species, weights=WEIGHTS):
+    return ratings(weights).rate(species)
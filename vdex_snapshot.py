@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from ctypes import Structure, c_size_t, c_uint16, c_uint32, sizeof
+import _vdex
+
+# A snapshot is one file holding everything the web apps read from the
+# pokedex: fixed-width records in the same layout as the C API structs, plus
+# a string table. Loading it maps the file copy-on-write, so the records are
+# read in place and the pages are shared between every process that loads
+# the same file.
+#
+# Layout: header (with the build id of the library that exported it),
+# layout fingerprint, section table, then each section aligned to 8 bytes.
+# Strings are decoded from the map as they are asked for.
+
+MAGIC = b"VDEXSNAP"
+VERSION = 3
+
+HEADER = struct.Struct("<8sIII32s")
+SECTION = struct.Struct("<8sQQ")
+ALIGN = 8
+
+NO_NAME = 0xFFFFFFFF
+
+class SnapshotError (Exception):
+    pass
+
+class FormRecord (Structure):
+    _fields_ = [
+            ("name", c_uint32),
+            ("veekun_id", c_uint16),
+            ("battle_only", _vdex.Boolean),
+            ]
+
+class Span (Structure):
+    _fields_ = [
+            ("start", c_uint32),
+            ("count", c_uint32),
+            ]
+
+# A snapshot can only be loaded by a build with the same record layout.
+def layout():
+    return [sizeof(t) for t in (c_size_t, _vdex.MoveDetails,
+                _vdex.ItemDetails, _vdex.SpeciesDetails, _vdex.PokemonDetails,
+                _vdex.MovesetEntry, _vdex.Learner, FormRecord, Span)] \
+            + [_vdex.MOVE_COUNT, _vdex.SPECIES_COUNT, _vdex.POKEMON_COUNT,
+                _vdex.TYPE_COUNT, _vdex.VERSION_GROUP_COUNT]
+
+# A snapshot holds the data of the library build that exported it, so it
+# is only loaded by that same build. The build is told apart by its kind,
+# size and mtime, which costs a stat rather than reading the library.
+def build_id():
+    st = os.stat(_vdex.LIBRARY)
+    return hashlib.sha256("{}:{}:{}".format(_vdex.BUILD, st.st_size,
+        st.st_mtime_ns).encode('utf-8')).digest()
+
+def _array(typ, values):
+    values = list(values)
+    return (typ * len(values))(*values)
+
+class _Strings:
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = [0]
+
+    def add(self, s):
+        self.data += s.encode('utf-8')
+        self.offsets.append(len(self.data))
+        return len(self.offsets) - 2
+
+# Export
+
+def export(filename):
+    strings = _Strings()
+    item_ids, items = _vdex.item_details_all()
+    counts = _vdex.pokemon_count_all()
+    vgs = list(_vdex.version_group_list())
+    forms, form_spans, entries, moveset_spans = [], [], [], []
+    for species in range(_vdex.SPECIES_COUNT):
+        for index in range(counts[species]):
+            handle = _vdex.pokemon(species, index)
+            form_spans.append(Span(len(forms), _vdex.form_count(handle)))
+            for form in range(_vdex.form_count(handle)):
+                name = _vdex.form_name(handle, form)
+                forms.append(FormRecord(
+                        NO_NAME if name is None else strings.add(name),
+                        _vdex.form_veekun_id(handle, form),
+                        _vdex.form_battle_only(handle, form)))
+            for vg in vgs:
+                moveset = _vdex.moveset(handle, vg)
+                moveset_spans.append(Span(len(entries), len(moveset)))
+                entries.extend(moveset)
+    sections = [
+            ("moves", _vdex.move_details_all()),
+            ("movename", _array(c_uint32, map(strings.add, _vdex.move_names()))),
+            ("itemids", item_ids),
+            ("items", items),
+            ("itemname", _array(c_uint32,
+                (strings.add(_vdex.item_name(item)) for item in item_ids))),
+            ("species", _vdex.species_details_all()),
+            ("spcname", _array(c_uint32,
+                map(strings.add, _vdex.species_names()))),
+            ("pcounts", counts),
+            ("pokemon", _vdex.pokemon_details_all()),
+            ("forms", _array(FormRecord, forms)),
+            ("formspan", _array(Span, form_spans)),
+            ("moveset", _array(_vdex.MovesetEntry, entries)),
+            ("msspan", _array(Span, moveset_spans)),
+            ("learners", _vdex.learners_all()),
+            ("efficacy", _vdex.efficacy_table()),
+            ("stroffs", _array(c_uint32, strings.offsets)),
+            ("strdata", bytes(strings.data)),
+            ]
+    sections = [(name, bytes(data)) for name, data in sections]
+    fingerprint = struct.pack("<{}I".format(len(layout())), *layout())
+    offset = HEADER.size + len(fingerprint) + SECTION.size * len(sections)
+    table = []
+    for name, data in sections:
+        offset += -offset % ALIGN
+        table.append(SECTION.pack(name.encode(), offset, len(data)))
+        offset += len(data)
+    directory = os.path.dirname(os.path.abspath(filename))
+    f = tempfile.NamedTemporaryFile(dir=directory, delete=False)
+    try:
+        with f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(layout()), len(sections),
+                build_id()))
+            f.write(fingerprint)
+            f.write(b"".join(table))
+            for name, data in sections:
+                f.write(b"\0" * (-f.tell() % ALIGN))
+                f.write(data)
+        # Readable by the other users that serve it.
+        os.chmod(f.name, 0o644)
+        os.replace(f.name, filename)
+    except BaseException:
+        os.unlink(f.name)
+        raise
+
+# Load
+
+class Snapshot:
+    def __init__(self, filename):
+        self.filename = filename
+        with open(filename, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        magic, version, layout_count, section_count, library = \
+                HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise SnapshotError("Not a vdex snapshot: {}".format(filename))
+        if version != VERSION:
+            raise SnapshotError("Unsupported snapshot version {}: {}".format(
+                version, filename))
+        offset = HEADER.size
+        if library != build_id() or list(struct.unpack_from(
+                "<{}I".format(layout_count), self._map, offset)) != layout():
+            raise SnapshotError("Snapshot was exported by a different build: "
+                    "{}".format(filename))
+        offset += 4 * layout_count
+        self._sections = {}
+        for _ in range(section_count):
+            name, start, size = SECTION.unpack_from(self._map, offset)
+            self._sections[name.rstrip(b"\0").decode()] = (start, size)
+            offset += SECTION.size
+        self.moves = self._array("moves", _vdex.MoveDetails)
+        self.item_ids = self._array("itemids", _vdex.Item)
+        self.items = self._array("items", _vdex.ItemDetails)
+        self.species = self._array("species", _vdex.SpeciesDetails)
+        self.counts = self._array("pcounts", c_size_t)
+        self.pokemon_records = self._array("pokemon", _vdex.PokemonDetails)
+        self.forms = self._array("forms", FormRecord)
+        self.form_spans = self._array("formspan", Span)
+        self.moveset_entries = self._array("moveset", _vdex.MovesetEntry)
+        self.moveset_spans = self._array("msspan", Span)
+        self.learners = self._array("learners", _vdex.Learner)
+        self.efficacy_records = self._array("efficacy", _vdex.Efficacy)
+        self.string_offsets = self._array("stroffs", c_uint32)
+        self.string_start = self._sections["strdata"][0]
+        self.move_name_ids = self._array("movename", c_uint32)
+        self.species_name_ids = self._array("spcname", c_uint32)
+        self.item_name_ids = self._array("itemname", c_uint32)
+        self._move_names = None
+        self._species_names = None
+        self._item_names = None
+        self.item_index = dict((item, i) for i, item in enumerate(self.item_ids))
+        self.offsets = [0]
+        for count in self.counts:
+            self.offsets.append(self.offsets[-1] + count)
+        self.vg_index = dict((vg, i)
+                for i, vg in enumerate(_vdex.version_group_list()))
+
+    def _array(self, name, typ):
+        start, size = self._sections[name]
+        return (typ * (size // sizeof(typ))).from_buffer(self._map, start)
+
+    def string(self, i):
+        start = self.string_start
+        return str(self._map[start + self.string_offsets[i]
+            :start + self.string_offsets[i + 1]], 'utf-8')
+
+    # The rest mirrors the _vdex functions that need the pokedex; install()
+    # swaps them in. Pokemon handles are indices into the pokemon records.
+
+    def move_details_all(self):
+        return self.moves
+
+    def move_details(self, move):
+        return self.moves[move]
+
+    def move_names(self):
+        if self._move_names is None:
+            self._move_names = tuple(map(self.string, self.move_name_ids))
+        return self._move_names
+
+    def move_name(self, move):
+        return self.string(self.move_name_ids[move])
+
+    def item_count(self):
+        return len(self.item_ids)
+
+    def item_details_all(self):
+        return self.item_ids, self.items
+
+    def item_details(self, item):
+        return self.items[self.item_index[item]]
+
+    def item_iter(self):
+        return iter(list(self.item_ids))
+
+    def item_names(self):
+        if self._item_names is None:
+            names = [""] * (max(self.item_ids, default=-1) + 1)
+            for item, name in zip(self.item_ids, self.item_name_ids):
+                names[item] = self.string(name)
+            self._item_names = tuple(names)
+        return self._item_names
+
+    def item_name(self, item):
+        i = self.item_index.get(item)
+        return "" if i is None else self.string(self.item_name_ids[i])
+
+    def species_details_all(self):
+        return self.species
+
+    def species_details(self, species):
+        return self.species[species]
+
+    def species_names(self):
+        if self._species_names is None:
+            self._species_names = tuple(map(self.string,
+                self.species_name_ids))
+        return self._species_names
+
+    def species_name(self, species):
+        return self.string(self.species_name_ids[species])
+
+    def pokemon_count_all(self):
+        return self.counts
+
+    def pokemon_count(self, species):
+        return self.counts[species]
+
+    def pokemon(self, species, index):
+        if not 0 <= index < self.counts[species]:
+            raise IndexError(index)
+        return self.offsets[species] + index
+
+    def pokemon_details_all(self):
+        return self.pokemon_records
+
+    def pokemon_details(self, handle):
+        return self.pokemon_records[handle]
+
+    def form_count(self, handle):
+        return self.form_spans[handle].count
+
+    def _form(self, handle, index):
+        span = self.form_spans[handle]
+        if not 0 <= index < span.count:
+            raise IndexError(index)
+        return self.forms[span.start + index]
+
+    def form_veekun_id(self, handle, index):
+        return self._form(handle, index).veekun_id
+
+    def form_battle_only(self, handle, index):
+        return self._form(handle, index).battle_only
+
+    def form_name(self, handle, index):
+        name = self._form(handle, index).name
+        return None if name == NO_NAME else self.string(name)
+
+    def _moveset_span(self, handle, vg):
+        return self.moveset_spans[handle * len(self.vg_index)
+                + self.vg_index[vg]]
+
+    def moveset_entry_count(self, handle, vg):
+        return self._moveset_span(handle, vg).count
+
+    def moveset_entry(self, handle, vg, index):
+        span = self._moveset_span(handle, vg)
+        if not 0 <= index < span.count:
+            raise IndexError(index)
+        return self.moveset_entries[span.start + index]
+
+    def moveset(self, handle, vg):
+        span = self._moveset_span(handle, vg)
+        return (_vdex.MovesetEntry * span.count).from_buffer(
+                self.moveset_entries, span.start * sizeof(_vdex.MovesetEntry))
+
+    def learner_count(self):
+        return len(self.learners)
+
+    def learners_all(self):
+        return self.learners
+
+    def efficacy_table(self):
+        return ((_vdex.Efficacy * _vdex.TYPE_COUNT) * _vdex.TYPE_COUNT) \
+                .from_buffer(self.efficacy_records)
+
+    def efficacy(self, damage, target):
+        if not 0 <= damage < _vdex.TYPE_COUNT:
+            raise _vdex.InvalidTypeError("Invalid damage type: {}".format(damage))
+        if not 0 <= target < _vdex.TYPE_COUNT:
+            raise _vdex.InvalidTypeError("Invalid target type: {}".format(target))
+        return self.efficacy_records[damage * _vdex.TYPE_COUNT + target]
+
+    def install(self, namespace):
+        for name in INSTALLED:
+            namespace[name] = getattr(self, name)
+
+INSTALLED = [
+        "move_details_all", "move_details", "move_names", "move_name",
+        "item_count", "item_details_all", "item_details", "item_iter",
+        "item_names", "item_name",
+        "species_details_all", "species_details", "species_names",
+        "species_name",
+        "pokemon_count_all", "pokemon_count", "pokemon", "pokemon_details_all",
+        "pokemon_details",
+        "form_count", "form_veekun_id", "form_battle_only", "form_name",
+        "moveset_entry_count", "moveset_entry", "moveset",
+        "learner_count", "learners_all",
+        "efficacy_table", "efficacy",
+        ]
+
+def usage():
+    print("""Usage: {0} <command> <file>
+export <file>
+    Write a snapshot of the pokedex to a file.
+check <file>
+    Load a snapshot and print what it contains.
+""".format(sys.argv[0]))
+
+def main():
+    if len(sys.argv) != 3:
+        usage()
+    elif sys.argv[1] == 'export':
+        export(sys.argv[2])
+    elif sys.argv[1] == 'check':
+        snapshot = Snapshot(sys.argv[2])
+        print("version {}, {} moves, {} items, {} species, {} pokemon, "
+                "{} moveset entries".format(VERSION, len(snapshot.moves),
+                    len(snapshot.items), len(snapshot.species),
+                    len(snapshot.pokemon_records),
+                    len(snapshot.moveset_entries)))
+    else:
+        usage()
+
+if __name__ == '__main__':
+    main()
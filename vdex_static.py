@@ -0,0 +1,148 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import posixpath
+import re
+import sys
+import tempfile
+import _vdex
+
+# Renders every page of a Flask app straight to files, laid out the way
+# `wget --mirror --adjust-extension --convert-links` used to: "/a/" becomes
+# a/index.html, "/a/b" becomes a/b.html, and site-absolute links are
+# rewritten relative to the page. A manifest next to the pages records the
+# inputs each page was rendered from, so unchanged pages are skipped and
+# pages of routes that no longer exist are deleted.
+# Templates see config.STATIC_BUILD while pages are rendered, to leave out
+# anything that needs a server, such as query-string forms.
+
+MANIFEST = ".vdex-static.json"
+
+LINK = re.compile(r'(href|src)="(/[^"#?]*)"')
+
+def page_path(route):
+    if route.endswith("/"):
+        return route.lstrip("/") + "index.html"
+    return route.lstrip("/") + ".html"
+
+def convert_links(html, path):
+    base = posixpath.dirname(path) or "."
+    def relative(match):
+        target = posixpath.relpath(page_path(match.group(2)), base)
+        return '{}="{}"'.format(match.group(1), target)
+    return LINK.sub(relative, html)
+
+def file_hash(filename, digest=None):
+    digest = digest or hashlib.sha256()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest
+
+# Every vdex module that has been imported, which includes all the code a
+# page can be rendered by.
+def code_files(*sources):
+    files = set(os.path.abspath(source) for source in sources)
+    for name, module in list(sys.modules.items()):
+        if (name == "_vdex" or name.startswith("vdex_")) \
+                and getattr(module, "__file__", None):
+            files.add(os.path.abspath(module.__file__))
+    return sorted(files)
+
+# Everything a page depends on besides its templates: the dex data (the
+# library or the loaded snapshot) and the code.
+def data_hash(*sources):
+    digest = hashlib.sha256()
+    data = os.environ.get("VDEX_SNAPSHOT") or _vdex.LIBRARY
+    for filename in [data] + code_files(*sources):
+        file_hash(filename, digest)
+    return digest.hexdigest()
+
+# The template and everything it extends, includes or imports. A name that
+# is only known at render time makes the page depend on every template.
+def template_hash(app, template):
+    import jinja2.meta
+    digest = hashlib.sha256()
+    seen = set()
+    pending = [template]
+    while pending:
+        name = pending.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        source, _, _ = app.jinja_loader.get_source(app.jinja_env, name)
+        digest.update(source.encode('utf-8'))
+        for referenced in jinja2.meta.find_referenced_templates(
+                app.jinja_env.parse(source)):
+            if referenced is None:
+                pending.extend(sorted(app.jinja_loader.list_templates()))
+            else:
+                pending.append(referenced)
+    return digest.hexdigest()
+
+def write_atomic(filename, data):
+    directory = os.path.dirname(filename)
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=directory, delete=False) as f:
+        f.write(data)
+    os.replace(f.name, filename)
+
+# Set in the parent before the pool forks.
+_app = None
+
+def _render(job):
+    route, path, output = job
+    response = _app.test_client().get(route)
+    if response.status_code != 200:
+        return path, response.status_code
+    html = convert_links(response.get_data(as_text=True), path)
+    write_atomic(os.path.join(output, path), html.encode('utf-8'))
+    return path, 200
+
+def build(app, routes, output, sources=(), processes=None, log=print):
+    global _app
+    manifest_file = os.path.join(output, MANIFEST)
+    try:
+        with open(manifest_file) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    data = data_hash(*sources)
+    templates = {}
+    keys = {}
+    jobs = []
+    for route, template in routes:
+        if template not in templates:
+            templates[template] = template_hash(app, template)
+        path = page_path(route)
+        keys[path] = data + templates[template]
+        if manifest.get(path) == keys[path] \
+                and os.path.exists(os.path.join(output, path)):
+            continue
+        jobs.append((route, path, output))
+    stale = [path for path in manifest if path not in keys]
+    for path in stale:
+        try:
+            os.remove(os.path.join(output, path))
+        except FileNotFoundError:
+            pass
+        del manifest[path]
+    log("{} pages, {} to render, {} removed".format(len(keys), len(jobs),
+        len(stale)))
+    if jobs:
+        _app = app
+        app.config["STATIC_BUILD"] = True
+        try:
+            with multiprocessing.get_context("fork").Pool(processes) as pool:
+                for path, status in pool.imap_unordered(_render, jobs, 16):
+                    if status == 200:
+                        manifest[path] = keys[path]
+                    else:
+                        manifest.pop(path, None)
+                        log("{}: HTTP {}".format(path, status))
+        finally:
+            app.config["STATIC_BUILD"] = False
+            _app = None
+    write_atomic(manifest_file, json.dumps(manifest, indent=1,
+            sort_keys=True).encode('utf-8'))
@@ -1,93 +1,35 @@
 #!/usr/bin/env python3
 import _vdex
+import heapq
+import math
+import multiprocessing
+import numpy
+import vdex_optimize
+import vdex_rating
 import sys
+import time
 from collections import OrderedDict
 from itertools import combinations
 
-def get_types(details):
-    if details.has_type2:
-        return (details.type1, details.type2)
-    else:
-        return (details.type1,)
-
-GROUND_TYPE = 4
-LEVITATE = 26
-
-FIRE_TYPE = 9
-FLASH_FIRE = 18
-
-WATER_TYPE = 10
-WATER_ABSORB = 11
-
-ELECTRIC_TYPE = 12
-VOLT_ABSORB = 10
-
-def get_immunity(details):
-    if details.ability1 == LEVITATE or details.ability2 == LEVITATE:
-        return GROUND_TYPE
-    elif details.ability1 == FLASH_FIRE or details.ability2 == FLASH_FIRE:
-        return FIRE_TYPE
-    elif details.ability1 == WATER_ABSORB or details.ability2 == WATER_ABSORB:
-        return WATER_TYPE
-    elif details.ability1 == VOLT_ABSORB or details.ability2 == VOLT_ABSORB:
-        return ELECTRIC_TYPE
-    else:
-        return None
-
-EFFICACY = { -2: 0, -1: 2, 0: 4, 1: 8}
-EFFICACY_RATING = { 0: 4, 1: 3, 2: 2, 4: 0, 8: -4, 16: -6 }
-
-def rate_resistance(types, immunity=None):
-    count = _vdex.TYPE_COUNT
-    efficacies = [4] * count
-    if immunity is not None:
-        efficacies[immunity] = 0
-    for typ in types:
-        for damage in range(count):
-            efficacies[damage] *= EFFICACY[_vdex.efficacy(damage, typ)]
-            efficacies[damage] //= 4
-    return [EFFICACY_RATING[efficacies[damage]] for damage in range(count)]
-
-def rate_offense(types):
-    count = _vdex.TYPE_COUNT
-    have_super = [0] * count
-    for typ in types:
-        for target in range(count):
-            if have_super[target] == 0:
-                have_super[target] = int(_vdex.efficacy(typ, target) > 0)
-    return have_super
-
 def gen_evolves(generations):
-    for species in range(_vdex.SPECIES_COUNT):
-        species_details = _vdex.species_details(species)
-        if species_details.generation not in generations:
-            continue
-        from_id = species_details.evolves_from.from_id
-        from_details = _vdex.species_details(from_id)
-        if from_details.generation not in generations:
-            continue
-        yield from_id
+    features = vdex_rating.features()
+    return features.pre_evolutions(generations).nonzero()[0].tolist()
 
 def rank_all(generations=None, final=False):
     if not generations:
         generations = list(range(5))
     evolves = set(gen_evolves(generations))
+    # TODO: Make offense less simplistic
+    ratings = vdex_rating.ratings().rating
+    in_generations = vdex_rating.features().in_generations(generations)
     all_rated = []
     for species in range(_vdex.SPECIES_COUNT):
-        species_details = _vdex.species_details(species)
-        if species_details.generation not in generations:
+        if not in_generations[species]:
             continue
         if final and species in evolves:
             continue
         name = _vdex.species_name(species)
-        pokemon = _vdex.pokemon(species, 0)
-        details = _vdex.pokemon_details(pokemon)
-        rating = sum(details.stats) - 400
-        types = get_types(details)
-        rating += 6 * sum(rate_resistance(types, get_immunity(details)))
-        # TODO: Make offense less simplistic
-        rating += 30 * sum(rate_offense(types))
-        all_rated.append((rating, name))
+        all_rated.append((int(ratings[species]), name))
     all_rated.sort(reverse=True)
     return all_rated
 
@@ -98,60 +40,136 @@ def print_ranked(generations=None, final=False):
 
 def print_team(*team):
     print("Nrm Fit Fly Psn Gnd Rck Bug Gst Stl Fir Wtr Grs Elc Psy Ice Dgn Drk Pokemon")
+    rated = vdex_rating.ratings()
     ratings = []
     for species in team:
         name = _vdex.species_name(species)
-        pokemon = _vdex.pokemon(species, 0)
-        details = _vdex.pokemon_details(pokemon)
-        types = get_types(details)
-        resistance = rate_resistance(types, get_immunity(details))
+        resistance = rated.resistance[species].tolist()
         print(" ".join([("({})" if r < 0 else " {} ").format(abs(r)) for r in resistance] + [name]))
-        offense = rate_offense(types)
+        offense = rated.offense[species].tolist()
         print("  ".join([(" +" if h else "  ") for h in offense]))
         ratings.append([resistance[typ] + (5 * offense[typ])
             for typ in range(_vdex.TYPE_COUNT)])
     totals = [sum(a) for a in zip(*ratings)]
     print(" ".join(["{:3d}".format(t) for t in totals] + ["TOTAL", str(sum(totals))]))
 
+def team_vectors(pokemon):
+    rated = vdex_rating.ratings()
+    return (rated.resistance[pokemon] + 5 * rated.offense[pokemon]).astype(int)
+
+def score_totals(totals):
+    mintotal = int(totals.min())
+    mincount = int((totals == mintotal).sum())
+    return (mintotal, -mincount, int(totals.sum()))
+
 def score_team(*team):
-    ratings = []
-    for species in team:
-        name = _vdex.species_name(species)
-        pokemon = _vdex.pokemon(species, 0)
-        details = _vdex.pokemon_details(pokemon)
-        types = get_types(details)
-        resistance = rate_resistance(types, get_immunity(details))
-        offense = rate_offense(types)
-        ratings.append([resistance[typ] + (5 * offense[typ])
-            for typ in range(_vdex.TYPE_COUNT)])
-    totals = [sum(a) for a in zip(*ratings)]
-    mintotal = min(totals)
-    mincount = totals.count(mintotal)
-    fulltotal = sum(totals)
-    return (mintotal, -mincount, fulltotal, team)
-
-def score_combinations(pokemon, size, cutoff):
-    combs = list(combinations(pokemon, size))
-    scores = []
-    for i, team in enumerate(combs):
-        if i % 1000 == 0:
-            print("{}/{}".format(i, len(combs)), file=sys.stderr)
-        score = score_team(*team)
+    return score_totals(team_vectors(list(team)).sum(axis=0)) + (team,)
+
+def keep_top(heap, top, entry):
+    if len(heap) < top:
+        heapq.heappush(heap, entry)
+    elif entry > heap[0]:
+        heapq.heapreplace(heap, entry)
+
+COVERAGE_TOP = 100
+
+# Coverage search state, set per worker by _init_coverage.
+_coverage = None
+
+def _init_coverage(pokemon, vectors, size, cutoff, top):
+    global _coverage
+    # best[i][k - 1] is, per type, the sum of the k largest ratings among
+    # candidates i and later: an upper bound on what k more picks can add.
+    best = [numpy.sort(vectors[i:], axis=0)[::-1].cumsum(axis=0)
+            for i in range(len(pokemon))]
+    _coverage = (pokemon, vectors, best, size, cutoff, top)
+
+def _extend(team, totals, start, heap, counts):
+    pokemon, vectors, best, size, cutoff, top = _coverage
+    remaining = size - len(team)
+    if remaining == 0:
+        counts[0] += 1
+        score = score_totals(totals)
         if score[0] >= cutoff:
-          scores.append(score)
-    print("Sorting...", file=sys.stderr)
-    scores.sort()
+            keep_top(heap, top, score + (tuple(team),))
+        return
+    for i in range(start, len(pokemon) - remaining + 1):
+        # Bounds only shrink as i grows, so the first failure ends the loop.
+        bound = totals + best[i][remaining - 1]
+        ubmin = bound.min()
+        if ubmin < cutoff:
+            break
+        if len(heap) == top and (ubmin, -1, bound.sum()) <= heap[0][:3]:
+            break
+        team.append(pokemon[i])
+        _extend(team, totals + vectors[i], i + 1, heap, counts)
+        team.pop()
+
+# Work is handed out by the first two members rather than the first alone,
+# which would leave the first=0 task with about a fifth of all teams.
+def _prefixes(n, size):
+    if size == 1:
+        return [(first,) for first in range(n)]
+    return [(first, second) for first in range(n - size + 1)
+            for second in range(first + 1, n - size + 2)]
+
+def _search_from(prefix):
+    pokemon, vectors = _coverage[:2]
+    heap = []
+    counts = [0]
+    totals = sum((vectors[i] for i in prefix[1:]), vectors[prefix[0]])
+    _extend([pokemon[i] for i in prefix], totals, prefix[-1] + 1, heap,
+            counts)
+    return prefix, heap, counts[0]
+
+def score_combinations(pokemon, size, cutoff, top=COVERAGE_TOP, processes=None):
+    n = len(pokemon)
+    if size < 1 or size > n:
+        return
+    total = math.comb(n, size)
+    vectors = team_vectors(pokemon)
+    heap = []
+    done = scored = 0
+    start = time.perf_counter()
+    with multiprocessing.Pool(processes, _init_coverage,
+            (pokemon, vectors, size, cutoff, top)) as pool:
+        for prefix, found, count in pool.imap_unordered(_search_from,
+                _prefixes(n, size)):
+            for entry in found:
+                keep_top(heap, top, entry)
+            done += math.comb(n - prefix[-1] - 1, size - len(prefix))
+            scored += count
+            elapsed = time.perf_counter() - start
+            print("\r{}/{} teams ({:.1f}%), {} scored, {:.0f} teams/s".format(
+                done, total, 100 * done / total, scored,
+                done / elapsed if elapsed else 0),
+                end="", file=sys.stderr)
+    print(file=sys.stderr)
+    scores = sorted(heap)
     for mt, mc, ft, team in scores:
         print("TEAM: {}".format(" ".join(_vdex.species_name(species) for species in team)))
         print_team(*team)
         print("MINIMUM: {} {}s; FULL TOTAL: {}".format(-mc, mt, ft))
         print()
 
+def print_optimized(size, maxgen, include, objective, budget):
+    result = vdex_optimize.optimize(size, objective, maxgen, include, budget)
+    if result is None:
+        print("No team found.")
+        return
+    team = result["team"]
+    print("TEAM: {}".format(" ".join(_vdex.species_name(species) for species in team)))
+    print_team(*team)
+    print("SCORE: {}; {} after {} nodes in {:.2f}s".format(
+        " ".join(str(s) for s in result["score"]),
+        "optimal" if result["optimal"] else "best found (out of time)",
+        result["nodes"], result["elapsed"]))
+
 def load_effects():
     effects = OrderedDict([(_vdex.move_effect_name(e), []) for e in _vdex.move_effect_list()])
-    for i in range(_vdex.MOVE_COUNT):
+    for i, details in enumerate(_vdex.move_details_all()):
         move = _vdex.move_name(i)
-        effect = _vdex.move_effect_name(_vdex.move_details(i).effect)
+        effect = _vdex.move_effect_name(details.effect)
         effects[effect].append(move)
     return effects
 
@@ -163,21 +181,26 @@ def print_effects():
         for move in moves:
             print("  " + move)
 
-SPECIES = dict([(_vdex.species_name(i), i) for i in range(_vdex.SPECIES_COUNT)])
+SPECIES = dict((name, i) for i, name in enumerate(_vdex.species_names()))
 
 def usage():
     print("""Usage: {0} <command> [arguments...]
 team [Pokemon...]
     Print a type analysis table for a team.
-coverage <team size> <cutoff> [Pokemon...]
-    Determine coverage teams of a given size and cutoff.
+coverage [--top N] <team size> <cutoff> [Pokemon...]
+    Determine the best N (default {1}) coverage teams of a given size and
+    cutoff.
+optimize [--score] [--budget S] <team size> <max generation> [Pokemon...]
+    Find the best team under the modified rating, or with --score under the
+    coverage score, containing the given Pokémon. Gives up after S seconds
+    (default {2}) with the best team found so far.
 rank all [Generations...]
     Rank Pokémon based on stats and type from the given generations.
 rank final [Generations...]
     Rank final evolutions  from the given generations.
 effects
     List pbirch move effects and their associated move lists.
-""".format(sys.argv[0]))
+""".format(sys.argv[0], COVERAGE_TOP, vdex_optimize.DEFAULT_BUDGET))
 
 def main():
     if len(sys.argv) < 2:
@@ -185,8 +208,34 @@ def main():
     elif sys.argv[1] == 'team':
         print_team(*[SPECIES[name] for name in sys.argv[2:]])
     elif sys.argv[1] == 'coverage' and len(sys.argv) > 4:
-        score_combinations([SPECIES[name] for name in sys.argv[4:]],
-                int(sys.argv[2]), int(sys.argv[3]))
+        args = sys.argv[2:]
+        top = COVERAGE_TOP
+        if args[0] == '--top':
+            top = int(args[1])
+            args = args[2:]
+        if len(args) < 3:
+            usage()
+        else:
+            score_combinations([SPECIES[name] for name in args[2:]],
+                    int(args[0]), int(args[1]), top)
+    elif sys.argv[1] == 'optimize':
+        args = sys.argv[2:]
+        objective = "modified_rating"
+        budget = vdex_optimize.DEFAULT_BUDGET
+        while args and args[0].startswith('--'):
+            if args[0] == '--score':
+                objective = "score_team"
+                args = args[1:]
+            elif args[0] == '--budget' and len(args) > 1:
+                budget = float(args[1])
+                args = args[2:]
+            else:
+                break
+        if len(args) < 2 or args[0].startswith('--'):
+            usage()
+        else:
+            print_optimized(int(args[0]), int(args[1]) - 1,
+                    [SPECIES[name] for name in args[2:]], objective, budget)
     elif sys.argv[1] == 'rank':
         generations = set([int(num) - 1 for num in sys.argv[3:]])
         if len(sys.argv) < 3:
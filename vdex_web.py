@@ -1,52 +1,155 @@
+import click
 import flask
+import math
+import threading
 import _vdex
+import vdex_api
+import vdex_cache
+import vdex_index
+import vdex_metrics
+import vdex_movesets
+import vdex_names
+import vdex_profile
+import vdex_static
 
-app = flask.Flask(__name__)
+STARTUP = vdex_profile.Startup("vdex_web")
+
+with STARTUP.phase("app"):
+    app = flask.Flask(__name__)
+    app.register_blueprint(vdex_api.api)
+    vdex_metrics.install(app, lambda: cache_info())
+    vdex_profile.install(app, STARTUP)
+    PAGES = vdex_cache.PageCache(app, __file__, vdex_api.__file__)
+
+# The bulk tables are fetched by the first request that needs one, not at
+# import, so a worker starts without building the pokedex.
+def once(build):
+    lock = threading.Lock()
+    value = []
+    def get():
+        if not value:
+            with lock:
+                if not value:
+                    value.append(build())
+        return value[0]
+    return get
+
+# Listing pages are streamed: rows are rendered as they are sent instead of
+# into one big string first. Jinja yields tiny pieces, so they are joined
+# into chunks of about STREAM_CHUNK characters before being written.
+STREAM_CHUNK = 16 * 1024
+
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+def _chunked(pieces):
+    chunk, size = [], 0
+    for piece in pieces:
+        chunk.append(piece)
+        size += len(piece)
+        if size >= STREAM_CHUNK:
+            yield "".join(chunk)
+            chunk, size = [], 0
+    if chunk:
+        yield "".join(chunk)
+
+def stream_template(name, **context):
+    app.update_template_context(context)
+    template = app.jinja_env.get_template(name)
+    return flask.Response(flask.stream_with_context(
+        _chunked(template.generate(context))))
+
+# Returns the name matching the query argument case-insensitively, None if
+# it is absent, and fails the request if it matches nothing. Generations can
+# also be given by number.
+def query_choice(arg, names, numbered=False):
+    value = flask.request.args.get(arg)
+    if value is None:
+        return None
+    if numbered and value.isdigit() and 1 <= int(value) <= len(names):
+        return names[int(value) - 1]
+    for name in names:
+        if value.lower() == name.lower():
+            return name
+    flask.abort(400)
+
+# Only paginates when ?page= is given, so the full listings stay at their
+# usual URLs.
+def paginate(rows):
+    args = flask.request.args
+    page = args.get("page", type=int)
+    if page is None:
+        if "page" in args:
+            flask.abort(400)
+        return rows, None
+    per_page = args.get("per_page", PAGE_SIZE, type=int)
+    if page < 1 or not 1 <= per_page <= MAX_PAGE_SIZE:
+        flask.abort(400)
+    pages = max(1, math.ceil(len(rows) / per_page))
+    if page > pages:
+        flask.abort(404)
+    def url(n):
+        query = args.to_dict()
+        query["page"] = n
+        return flask.url_for(flask.request.endpoint, **query)
+    pagination = {"page": page, "pages": pages, "count": len(rows),
+            "prev": url(page - 1) if page > 1 else None,
+            "next": url(page + 1) if page < pages else None}
+    return rows[(page - 1) * per_page:page * per_page], pagination
+
+GENERATION_NAMES = [_vdex.generation_name(generation)
+        for generation in _vdex.generation_list()]
 
 @app.route("/")
+@PAGES.cached
 def index():
     return flask.render_template("index.html")
 
 @app.route("/enums/")
+@PAGES.cached
 def enums():
     return flask.render_template("enums.html")
 
 @app.route("/enums/<name>")
+@PAGES.cached
 def enum(name):
     sname = _vdex.to_snake_case(name)
-    if not hasattr(_vdex, sname + "_list"):
+    if not hasattr(_vdex, sname.upper() + "_NAMES"):
         flask.abort(404)
-    _list = getattr(_vdex, sname + "_list")
-    _name = getattr(_vdex, sname + "_name")
-    names = [_name(i) for i in _list()]
+    names = getattr(_vdex, sname.upper() + "_NAMES")
     return flask.render_template("enum.html", name=name, names=names)
 
 @app.route("/efficacy")
+@PAGES.cached
 def efficacy():
-    types = _vdex.type_list()
-    names = [_vdex.type_name(t) for t in types]
-    efficacy = [[_vdex.efficacy(a, d) for d in types] for a in types]
+    names = _vdex.TYPE_NAMES
+    efficacy = [list(row) for row in _vdex.efficacy_table()]
     return flask.render_template("efficacy.html", names=names, efficacy=efficacy)
 
+items_by_id = once(lambda: dict(zip(*_vdex.item_details_all())))
+
 @app.route("/items/")
+@PAGES.cached
 def items():
+    only_pocket = query_choice("pocket", _vdex.POCKET_NAMES)
     pockets = {}
-    for item in _vdex.item_iter():
-        item_name = _vdex.item_name(item)
-        details = _vdex.item_details(item)
+    item_names = _vdex.item_names()
+    for item, details in items_by_id().items():
+        item_name = item_names[item]
         category = (details.category, _vdex.item_category_name(details.category))
         pocket = (details.pocket, _vdex.pocket_name(details.pocket))
+        if only_pocket is not None and pocket[1] != only_pocket:
+            continue
         pockets.setdefault(pocket, {}).setdefault(category, []).append((item, item_name))
-    return flask.render_template("items.html", pockets=pockets)
-
-VALID_ITEMS = list(_vdex.item_iter())
+    return stream_template("items.html", pockets=pockets)
 
 @app.route("/items/<int:item>")
+@PAGES.cached
 def item(item):
-    if item not in VALID_ITEMS:
+    details = items_by_id().get(item)
+    if details is None:
         flask.abort(404)
     name = _vdex.item_name(item)
-    details = _vdex.item_details(item)
     category = _vdex.item_category_name(details.category)
     pocket = _vdex.pocket_name(details.pocket)
     fling_effect = _vdex.fling_effect_name(details.fling_effect)
@@ -61,48 +164,131 @@ def item(item):
         flavor = "primarily " + _vdex.flavor_name(details.flavor)
     return flask.render_template("item.html", **locals())
 
+# Records are thin views over the bulk detail arrays: they only hold their
+# ids and read the shared structs and name tables on access. Anything that
+# takes real work to derive is computed once and kept in a slot.
+
+move_details = once(_vdex.move_details_all)
+
+EFFECT_SPACED = {}
+
+def damage_class_name(damage_class):
+    name = _vdex.damage_class_name(damage_class)
+    if name == "NonDamaging":
+        return "Status"
+    return name
+
+def _chance(chance):
+    return 100 if chance == 0 else chance
+
 class Move:
+    __slots__ = ("move", "_extra")
+
     def __init__(self, move):
         self.move = move
-        self.name = _vdex.move_name(move)
-        self.details = details = _vdex.move_details(move)
-        self.generation = _vdex.generation_name(details.generation)
-        self.typ = _vdex.type_name(details.typ)
-        self.power = details.power
-        if self.power == 0:
-            self.power = "--"
-        elif self.power == 1:
-            self.power = "*"
-        self.accuracy = details.accuracy
-        if self.accuracy == _vdex.NEVER_MISSES:
-            self.accuracy = "--"
-        self.target = _vdex.move_target_name(details.target)
-        self.damage_class = _vdex.damage_class_name(details.damage_class)
-        if self.damage_class == "NonDamaging":
-            self.damage_class = "Status"
-        self.effect = _vdex.move_effect_name(details.effect)
-        self.effect_spaced = _vdex.to_snake_case(self.effect).replace("_", " ")
-        self.category = _vdex.move_category_name(details.category)
-        self.ailment = _vdex.ailment_name(details.ailment)
-        self.stat_changes = []
-        for index, name in enumerate(_vdex.STAT_CHANGE):
-            change = details.stat_changes[index]
-            if change != 0:
-                self.stat_changes.append((change, name))
-        self.flags = []
-        for name in _vdex.MOVE_FLAG:
-            if details.flags & getattr(_vdex, "MOVE_FLAG_" + name):
-                self.flags.append(name)
-        # Generate Summary
-        self.extra = []
-        def _c(chance):
-            return 100 if chance == 0 else chance
+        self._extra = None
+
+    @property
+    def details(self):
+        return move_details()[self.move]
+
+    @property
+    def name(self):
+        return _vdex.move_names()[self.move]
+
+    @property
+    def generation(self):
+        return _vdex.generation_name(self.details.generation)
+
+    @property
+    def typ(self):
+        return _vdex.type_name(self.details.typ)
+
+    @property
+    def power(self):
+        power = self.details.power
+        if power == 0:
+            return "--"
+        elif power == 1:
+            return "*"
+        return power
+
+    @property
+    def accuracy(self):
+        accuracy = self.details.accuracy
+        if accuracy == _vdex.NEVER_MISSES:
+            return "--"
+        return accuracy
+
+    @property
+    def pp(self):
+        return self.details.pp
+
+    @property
+    def priority(self):
+        return self.details.priority
+
+    @property
+    def effect_chance(self):
+        return self.details.effect_chance
+
+    @property
+    def target(self):
+        return _vdex.move_target_name(self.details.target)
+
+    @property
+    def damage_class(self):
+        return damage_class_name(self.details.damage_class)
+
+    @property
+    def effect(self):
+        return _vdex.move_effect_name(self.details.effect)
+
+    @property
+    def effect_spaced(self):
+        effect = self.effect
+        if effect not in EFFECT_SPACED:
+            EFFECT_SPACED[effect] = _vdex.to_snake_case(effect) \
+                    .replace("_", " ")
+        return EFFECT_SPACED[effect]
+
+    @property
+    def category(self):
+        return _vdex.move_category_name(self.details.category)
+
+    @property
+    def ailment(self):
+        return _vdex.ailment_name(self.details.ailment)
+
+    @property
+    def stat_changes(self):
+        changes = self.details.stat_changes
+        return [(changes[index], name)
+                for index, name in enumerate(_vdex.STAT_CHANGE)
+                if changes[index] != 0]
+
+    @property
+    def flags(self):
+        flags = self.details.flags
+        return [name for name in _vdex.MOVE_FLAG
+                if flags & getattr(_vdex, "MOVE_FLAG_" + name)]
+
+    @property
+    def extra(self):
+        if self._extra is None:
+            self._extra = tuple(self._summary())
+        return self._extra
+
+    def _summary(self):
+        details = self.details
+        extra = []
         def _a(fmt, *args):
-            self.extra.append(fmt.format(*args) + ".")
-        if self.ailment != "None":
-            chance = _c(details.ailment_chance)
+            extra.append(fmt.format(*args) + ".")
+        ailment = self.ailment
+        if ailment != "None":
+            chance = _chance(details.ailment_chance)
             volstar = "*" if details.ailment_volatile else ""
-            _a("{}% {}{} chance", chance, self.ailment, volstar)
+            _a("{}% {}{} chance", chance, ailment, volstar)
         if details.min_hits != 1 or details.max_hits != 1:
             if details.min_hits == details.max_hits:
                 _a("{} hits", details.max_hits)
@@ -123,29 +309,146 @@ class Move:
             _a("Increased critical rate")
         if details.flinch_chance > 0:
             _a("{}% flinch chance", details.flinch_chance)
-        if self.stat_changes == [(1, name) for name in _vdex.STAT_CHANGE[:5]]:
-            _a("{}% chance to +1 all stats", _c(details.stat_chance))
-        elif self.stat_changes:
+        stat_changes = self.stat_changes
+        if stat_changes == [(1, name) for name in _vdex.STAT_CHANGE[:5]]:
+            _a("{}% chance to +1 all stats", _chance(details.stat_chance))
+        elif stat_changes:
             changes = " and ".join(["{:+d} {}".format(change, name.lower()
-                .replace("_", " ")) for change, name in self.stat_changes])
-            if _c(details.stat_chance) == 100:
+                .replace("_", " ")) for change, name in stat_changes])
+            if _chance(details.stat_chance) == 100:
                 _a("{}", changes)
             else:
-                _a("{}% chance for {}", _c(details.stat_chance), changes)
+                _a("{}% chance for {}", _chance(details.stat_chance), changes)
+        return extra
 
 MOVES = [Move(move) for move in range(_vdex.MOVE_COUNT)]
+DAMAGE_CLASSES = sorted(damage_class_name(damage_class)
+        for damage_class in _vdex.damage_class_list())
 
 @app.route("/moves/")
+@PAGES.cached
 def moves():
-    return flask.render_template("moves.html", moves=MOVES)
+    typ = query_choice("type", _vdex.TYPE_NAMES)
+    generation = query_choice("gen", GENERATION_NAMES, numbered=True)
+    damage_class = query_choice("class", DAMAGE_CLASSES)
+    moves = [move for move in MOVES
+            if typ in (None, move.typ)
+            and generation in (None, move.generation)
+            and damage_class in (None, move.damage_class)]
+    moves, pagination = paginate(moves)
+    return stream_template("moves.html", moves=moves, pagination=pagination)
+
+move_index = once(lambda: vdex_index.MoveIndex(move_details()))
+
+def query_int(arg, default=None):
+    value = flask.request.args.get(arg)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise vdex_index.QueryError("Not a number: {}={}".format(arg, value))
+
+def move_summary(move):
+    details = move.details
+    return {"id": move.move, "name": move.name, "type": move.typ,
+            "class": move.damage_class, "gen": move.generation,
+            "power": details.power, "accuracy": details.accuracy,
+            "pp": move.pp, "priority": move.priority,
+            "flags": move.flags}
+
+AUTOCOMPLETE_LIMIT = 50
+
+@app.route("/api/autocomplete")
+def autocomplete():
+    args = flask.request.args
+    kinds = args.get("kind", ",".join(vdex_names.KINDS)).split(",")
+    limit = args.get("limit", vdex_names.DEFAULT_LIMIT, type=int)
+    if any(kind not in vdex_names.KINDS for kind in kinds) \
+            or not 1 <= limit <= AUTOCOMPLETE_LIMIT:
+        return flask.jsonify(error="Bad kind or limit"), 400
+    results = vdex_names.autocomplete(args.get("q", ""), kinds, limit)
+    return flask.jsonify(results=[{"kind": kind, "id": i, "name": name}
+        for kind, i, name in results])
+
+# Comma-separated or repeated values of an argument are alternatives, except
+# for flag, where all must be set. Ranges are given as <attr>_min and
+# <attr>_max.
+@app.route("/api/moves/search")
+def search_moves():
+    args = flask.request.args
+    query = {}
+    try:
+        for arg in list(vdex_index.CATEGORIES) + ["flag", "stat"]:
+            if arg in args:
+                query[arg] = [value for raw in args.getlist(arg)
+                        for value in raw.split(",") if value]
+        for arg in vdex_index.RANGES:
+            for bound in ("_min", "_max"):
+                query[arg + bound] = query_int(arg + bound)
+        count, moves = move_index().search(query, args.get("sort", "id"),
+                query_int("limit", vdex_index.DEFAULT_LIMIT),
+                query_int("offset", 0))
+    except vdex_index.QueryError as e:
+        return flask.jsonify(error=str(e)), 400
+    return flask.jsonify(count=count,
+            results=[move_summary(MOVES[move]) for move in moves])
 
 @app.route("/moves/<int:move>")
+@PAGES.cached
 def move(move):
     if move < 0 or move >= _vdex.MOVE_COUNT:
         flask.abort(404)
     return flask.render_template("move.html", move=MOVES[move])
 
+learner_index = once(vdex_index.LearnerIndex)
+
+VERSION_GROUP_NAMES = [_vdex.version_group_name(vg)
+        for vg in _vdex.version_group_list()]
+DEFAULT_VERSION_GROUP = "BlackWhite2"
+
+# [(version group name, [(learn method, level, species, pokemon), ...])]
+def move_learners(move):
+    vg_name = query_choice("vg", VERSION_GROUP_NAMES)
+    groups = []
+    for vg in _vdex.version_group_list():
+        name = _vdex.version_group_name(vg)
+        if vg_name not in (None, name):
+            continue
+        learners = []
+        for species, index, method, level in learner_index().learners(move, vg):
+            learners.append((_vdex.learn_method_name(method), level,
+                    species, index))
+        if learners or vg_name is not None:
+            groups.append((name, learners))
+    return groups
+
+@app.route("/moves/<int:move>/learners")
+@PAGES.cached
+def learners(move):
+    if move < 0 or move >= _vdex.MOVE_COUNT:
+        flask.abort(404)
+    groups = [(name, [(method, level, get_species(species),
+                    get_species(species).pokemon[index])
+                for method, level, species, index in learners])
+            for name, learners in move_learners(move)]
+    return flask.render_template("learners.html", move=MOVES[move],
+            groups=groups)
+
+@app.route("/api/moves/<int:move>/learners")
+def api_learners(move):
+    if move < 0 or move >= _vdex.MOVE_COUNT:
+        flask.abort(404)
+    species_names = _vdex.species_names()
+    return flask.jsonify(move=move, name=MOVES[move].name,
+            version_groups=dict((name, [{"species": species,
+                        "name": species_names[species], "pokemon": index,
+                        "learn_method": method, "level": level}
+                    for method, level, species, index in learners])
+                for name, learners in move_learners(move)))
+
 @app.route("/palace")
+@PAGES.cached
 def palace():
     rows = zip([_vdex.nature_name(nature) for nature in _vdex.nature_list()],
             _vdex.palace_low_attack(), _vdex.palace_low_defense(),
@@ -153,76 +456,227 @@ def palace():
     return flask.render_template("palace.html", rows=rows)
 
 SPECIES = [None] * _vdex.SPECIES_COUNT
+species_details = once(_vdex.species_details_all)
+
+SPECIES_STATS = {"hits": 0, "misses": 0}
+_species_lock = threading.Lock()
 
 def get_species(species):
     if species < 0 or species >= _vdex.SPECIES_COUNT:
         return None
-    if species not in SPECIES:
-        SPECIES[species] = Species(species)
-    return SPECIES[species]
+    with _species_lock:
+        s = SPECIES[species]
+        if s is None:
+            SPECIES_STATS["misses"] += 1
+            s = SPECIES[species] = Species(species)
+        else:
+            SPECIES_STATS["hits"] += 1
+    return s
+
+def cache_info():
+    built = _vdex.SPECIES_COUNT - SPECIES.count(None)
+    return {"species": dict(SPECIES_STATS, currsize=built,
+                maxsize=_vdex.SPECIES_COUNT),
+            "movesets": MOVESETS.info(),
+            "pages": PAGES.info()}
 
 class EvolvesFrom:
-    def __init__(self, struct):
-        self.struct = struct
-        self.ef = get_species(getattr(struct, "from"))
-        self.trigger = _vdex.evolution_trigger_name(struct.trigger)
-        self.gender = _vdex.gender_name(struct.gender)
-        self.mov = None
-        if struct.mov < _vdex.MOVE_COUNT:
-            self.mov = MOVES[struct.mov]
+    __slots__ = ("species",)
+
+    def __init__(self, species):
+        self.species = species
+
+    @property
+    def struct(self):
+        return species_details()[self.species].evolves_from
+
+    @property
+    def ef(self):
+        return get_species(self.struct.from_id)
+
+    @property
+    def trigger(self):
+        return _vdex.evolution_trigger_name(self.struct.trigger)
+
+    @property
+    def gender(self):
+        return _vdex.gender_name(self.struct.gender)
+
+    @property
+    def level(self):
+        return self.struct.level
+
+    @property
+    def relative_physical_stats(self):
+        return self.struct.relative_physical_stats
+
+    @property
+    def mov(self):
+        mov = self.struct.mov
+        if mov < _vdex.MOVE_COUNT:
+            return MOVES[mov]
+        return None
+
+MOVESETS = vdex_movesets.MovesetStore(MOVES)
+
+def get_movesets(species, index):
+    return vdex_movesets.Movesets(MOVESETS, species, index)
+
+pokemon_details = once(_vdex.pokemon_details_all)
+
+def _pokemon_offsets():
+    offsets = [0]
+    for count in _vdex.pokemon_count_all():
+        offsets.append(offsets[-1] + count)
+    return offsets
+
+pokemon_offsets = once(_pokemon_offsets)
 
 class Pokemon:
-    def __init__(self, handle):
-        self.details = details = _vdex.pokemon_details(handle)
-        self.abilities = [_vdex.ability_name(details.ability1)]
+    __slots__ = ("species", "index", "_forms")
+
+    def __init__(self, species, index):
+        self.species = species
+        self.index = index
+        self._forms = None
+
+    @property
+    def details(self):
+        return pokemon_details()[pokemon_offsets()[self.species] + self.index]
+
+    @property
+    def abilities(self):
+        details = self.details
+        abilities = [_vdex.ability_name(details.ability1)]
         if details.has_ability2:
-            self.abilities.append(_vdex.ability_name(details.ability2))
-        self.hidden_ability = None
+            abilities.append(_vdex.ability_name(details.ability2))
+        return abilities
+
+    @property
+    def hidden_ability(self):
+        details = self.details
         if details.has_hidden_ability:
-            self.hidden_ability = _vdex.ability_name(details.hidden_ability)
-        self.stats = dict(zip(_vdex.STAT_PERMANENT, details.stats))
-        self.types = [_vdex.type_name(details.type1)]
+            return _vdex.ability_name(details.hidden_ability)
+        return None
+
+    @property
+    def stats(self):
+        return dict(zip(_vdex.STAT_PERMANENT, self.details.stats))
+
+    @property
+    def types(self):
+        details = self.details
+        types = [_vdex.type_name(details.type1)]
         if details.has_type2:
-            self.types.append(_vdex.type_name(details.type2))
-        self.forms = []
-        for index in range(_vdex.form_count(handle)):
-            self.forms.append((_vdex.form_name(handle, index),
-                    _vdex.form_battle_only(handle, index)))
-        self.movesets = {}
-        for vg in _vdex.version_group_list():
-            self.movesets[_vdex.version_group_name(vg)] = moveset = []
-            for index in range(_vdex.moveset_entry_count(handle, vg)):
-                entry = _vdex.moveset_entry(handle, vg, index)
-                learn_method = _vdex.learn_method_name(entry.learn_method)
-                moveset.append((entry.learn_method, learn_method, entry.level,
-                        index, MOVES[entry.mov]))
-            moveset.sort()
+            types.append(_vdex.type_name(details.type2))
+        return types
+
+    # Forms are not in the bulk arrays, so they are fetched once.
+    @property
+    def forms(self):
+        if self._forms is None:
+            handle = _vdex.pokemon(self.species, self.index)
+            self._forms = tuple((_vdex.form_name(handle, index),
+                        _vdex.form_battle_only(handle, index))
+                    for index in range(_vdex.form_count(handle)))
+        return self._forms
+
+    @property
+    def movesets(self):
+        return get_movesets(self.species, self.index)
 
 class Species:
+    __slots__ = ("species", "pokemon")
+
     def __init__(self, species):
         self.species = species
-        self.name = _vdex.species_name(species)
-        self.details = details = _vdex.species_details(species)
-        self.generation = _vdex.generation_name(details.generation)
-        self.egg_groups = [_vdex.egg_group_name(details.egg_group1)]
+        self.pokemon = tuple(Pokemon(species, index)
+                for index in range(_vdex.pokemon_count(species)))
+
+    @property
+    def name(self):
+        return _vdex.species_names()[self.species]
+
+    @property
+    def details(self):
+        return species_details()[self.species]
+
+    @property
+    def generation(self):
+        return _vdex.generation_name(self.details.generation)
+
+    @property
+    def egg_groups(self):
+        details = self.details
+        egg_groups = [_vdex.egg_group_name(details.egg_group1)]
         if details.has_egg_group2:
-            self.egg_groups.append(_vdex.egg_group_name(details.egg_group2))
-        self.evolves_from = None
-        if details.evolved:
-            self.evolves_from = EvolvesFrom(details.evolves_from)
-        self.pokemon = []
-        for index in range(_vdex.pokemon_count(species)):
-            self.pokemon.append(Pokemon(_vdex.pokemon(species, index)))
+            egg_groups.append(_vdex.egg_group_name(details.egg_group2))
+        return egg_groups
 
-for _species in range(_vdex.SPECIES_COUNT):
-    get_species(_species)
+    @property
+    def evolves_from(self):
+        if self.details.evolved:
+            return EvolvesFrom(self.species)
+        return None
 
 @app.route("/species/")
+@PAGES.cached
 def species():
-    return flask.render_template("species.html", speciess=SPECIES)
+    typ = query_choice("type", _vdex.TYPE_NAMES)
+    generation = query_choice("gen", GENERATION_NAMES, numbered=True)
+    matches = list(range(_vdex.SPECIES_COUNT))
+    if generation is not None:
+        matches = [s for s in matches if _vdex.generation_name(
+            species_details()[s].generation) == generation]
+    if typ is not None:
+        matches = [s for s in matches if any(typ in p.types
+            for p in get_species(s).pokemon)]
+    matches, pagination = paginate(matches)
+    # Built as the rows are streamed.
+    speciess = (get_species(s) for s in matches)
+    return stream_template("species.html", speciess=speciess,
+            pagination=pagination)
 
 @app.route("/species/<int:species>/")
 @app.route("/species/<int:species>/<int:pokemon>")
+@PAGES.cached
 def pokemon(species, pokemon=0):
-    return flask.render_template("pokemon.html", species=SPECIES[species],
-            pokemon=SPECIES[species].pokemon[pokemon])
+    s = get_species(species)
+    if s is None or pokemon >= len(s.pokemon):
+        flask.abort(404)
+    vg = query_choice("vg", VERSION_GROUP_NAMES) or DEFAULT_VERSION_GROUP
+    return flask.render_template("pokemon.html", species=s,
+            pokemon=s.pokemon[pokemon], vg=vg,
+            version_groups=VERSION_GROUP_NAMES)
+
+def static_routes():
+    yield "/", "index.html"
+    yield "/enums/", "enums.html"
+    for name in _vdex.ENUMS:
+        yield "/enums/" + name, "enum.html"
+    yield "/efficacy", "efficacy.html"
+    yield "/items/", "items.html"
+    for item in sorted(items_by_id()):
+        yield "/items/{}".format(item), "item.html"
+    yield "/moves/", "moves.html"
+    for move in range(_vdex.MOVE_COUNT):
+        yield "/moves/{}".format(move), "move.html"
+        yield "/moves/{}/learners".format(move), "learners.html"
+    yield "/palace", "palace.html"
+    yield "/species/", "species.html"
+    for species, count in enumerate(_vdex.pokemon_count_all()):
+        yield "/species/{}/".format(species), "pokemon.html"
+        if count > 1:
+            for pokemon in range(count):
+                yield "/species/{}/{}".format(species, pokemon), "pokemon.html"
+
+@app.cli.command("build-static")
+@click.argument("output", default="output/localhost:5000")
+@click.option("--processes", type=int, default=None,
+        help="Worker processes (default: one per CPU).")
+def build_static(output, processes):
+    """Render every page into OUTPUT, skipping unchanged pages."""
+    vdex_static.build(app, list(static_routes()), output,
+            sources=(__file__,), processes=processes, log=click.echo)
+
+STARTUP.report()
@@ -1,104 +1,61 @@
 import flask
 import _vdex
+import vdex_cache
+import vdex_metrics
+import vdex_names
+import vdex_optimize
+import vdex_profile
+import vdex_rating
 import math
+import numpy
+
+STARTUP = vdex_profile.Startup("vdex_web3")
 
 app = flask.Flask(__name__)
+vdex_metrics.install(app, lambda: {"results": RESULTS.info()})
+vdex_profile.install(app, STARTUP)
 
-def get_types(details):
-    if details.has_type2:
-        return (details.type1, details.type2)
-    else:
-        return (details.type1,)
+with STARTUP.phase("species names"):
+    SPECIES = dict((name, i) for i, name in enumerate(_vdex.species_names()))
 
-def rate_offense(types):
-    count = _vdex.TYPE_COUNT
-    have_super = [0] * count
-    for typ in types:
-        for target in range(count):
-            if have_super[target] == 0:
-                have_super[target] = int(_vdex.efficacy(typ, target) > 0)
-    return have_super
-
-GROUND_TYPE = 4
-LEVITATE = 26
-
-FIRE_TYPE = 9
-FLASH_FIRE = 18
-
-WATER_TYPE = 10
-WATER_ABSORB = 11
-
-ELECTRIC_TYPE = 12
-VOLT_ABSORB = 10
-
-def get_immunity(details):
-    if details.ability1 == LEVITATE or details.ability2 == LEVITATE:
-        return GROUND_TYPE
-    elif details.ability1 == FLASH_FIRE or details.ability2 == FLASH_FIRE:
-        return FIRE_TYPE
-    elif details.ability1 == WATER_ABSORB or details.ability2 == WATER_ABSORB:
-        return WATER_TYPE
-    elif details.ability1 == VOLT_ABSORB or details.ability2 == VOLT_ABSORB:
-        return ELECTRIC_TYPE
-    else:
-        return None
-
-EFFICACY = { -2: 0, -1: 2, 0: 4, 1: 8}
-EFFICACY_RATING = { 0: 4, 1: 3, 2: 2, 4: 0, 8: -4, 16: -6 }
-
-def rate_resistance(types, immunity=None):
-    count = _vdex.TYPE_COUNT
-    efficacies = [4] * count
-    if immunity is not None:
-        efficacies[immunity] = 0
-    for typ in types:
-        for damage in range(count):
-            efficacies[damage] *= EFFICACY[_vdex.efficacy(damage, typ)]
-            efficacies[damage] //= 4
-    return [EFFICACY_RATING[efficacies[damage]] for damage in range(count)]
-
-def gen_evolves(maxgen):
-    for species in range(_vdex.SPECIES_COUNT):
-        species_details = _vdex.species_details(species)
-        if species_details.generation > maxgen:
-            continue
-        from_id = species_details.evolves_from.from_id
-        from_details = _vdex.species_details(from_id)
-        if from_details.generation > maxgen:
-            continue
-        yield from_id
-
-SPECIES = dict([(_vdex.species_name(i), i) for i in range(_vdex.SPECIES_COUNT)])
+@app.errorhandler(vdex_names.UnknownName)
+def unknown_name(e):
+    return flask.jsonify(error="Unknown species: {}".format(e.args[0])), 400
+
+# Accepts loose spellings; see vdex_names.
+def species_name(name):
+    return _vdex.species_name(vdex_names.resolve("species", name))
 
 def rate(name):
-    species = SPECIES[name]
-    species_details = _vdex.species_details(species)
-    pokemon = _vdex.pokemon(species, 0)
-    details = _vdex.pokemon_details(pokemon)
-    types = get_types(details)
-    offense = rate_offense(types)
-    resistance = rate_resistance(types, get_immunity(details))
-    stats = list(details.stats)
-    rating = 30 * sum(offense) + 6 * sum(resistance) + sum(stats) - 400
-    r = {   "offense": offense,
-            "resistance": resistance,
-            "stats": stats,
-            "rating": rating}
-    #print(r)
-    return r
-
-RATINGS = dict([(name, rate(name)) for name in SPECIES])
+    return vdex_rating.rate(vdex_names.resolve("species", name))
+
+with STARTUP.phase("ratings"):
+    RATINGS = dict([(name, vdex_rating.rate(i))
+        for name, i in SPECIES.items()])
 
 @app.route("/rate/<name>")
 def route_rate(name):
     return flask.jsonify(rate(name))
 
 def team(names):
+    names = [species_name(name) for name in names]
     return dict([(name, RATINGS[name]) for name in names])
 
+# Teams are cached by their sorted species ids, so the same team in any
+# order or spelling is computed once.
+RESULTS = vdex_cache.ResultCache()
+
+def canonical_team(names):
+    return tuple(sorted(vdex_names.resolve("species", name) for name in names))
+
+def team_names(species):
+    return [_vdex.species_name(s) for s in species]
+
 @app.route("/team")
 def route_team():
-    return flask.jsonify(team(flask.request.args.getlist("poke")))
+    species = canonical_team(flask.request.args.getlist("poke"))
+    return flask.jsonify(RESULTS.get(("team", species),
+        lambda: team(team_names(species))))
 
 def modified_rating(team_dict, base_values=None):
     count = _vdex.TYPE_COUNT
@@ -123,27 +80,97 @@ def modified_rating(team_dict, base_values=None):
     return (modr, (sum(coverage), ratings_total, negatives),
             (coverage, or_totals, ratings_total))
 
+class SuggestEngine:
+    def __init__(self, weights=vdex_rating.WEIGHTS):
+        features = vdex_rating.features()
+        ratings = vdex_rating.ratings(weights)
+        self.names = _vdex.species_names()
+        self.offense = ratings.offense.astype(bool)
+        self.or_values = 5 * ratings.offense + ratings.resistance
+        self.rating = ratings.rating
+        # Candidates for each maxgen: species from those generations that
+        # do not evolve into another species from those generations.
+        self.candidates = []
+        for maxgen in range(_vdex.GENERATION_COUNT):
+            generations = range(maxgen + 1)
+            mask = features.in_generations(generations) \
+                    & ~features.pre_evolutions(generations)
+            self.candidates.append(mask.nonzero()[0])
+
+    # Equivalent to modified_rating({name: RATINGS[name]}, base_values) for
+    # every candidate, keeping the suggest_count best.
+    def suggest(self, base_values, maxgen, suggest_count):
+        if maxgen < 0 or suggest_count <= 0:
+            return []
+        candidates = self.candidates[min(maxgen, len(self.candidates) - 1)]
+        coverage, or_totals, ratings_total = base_values
+        count = _vdex.TYPE_COUNT
+        covered = (numpy.asarray(coverage, dtype=bool)
+                | self.offense[candidates]).sum(axis=1)
+        totals = numpy.asarray(or_totals) + self.or_values[candidates]
+        ratings_totals = ratings_total + self.rating[candidates]
+        negatives = numpy.maximum(-totals, 0).sum(axis=1)
+        modrs = numpy.where(ratings_totals > 0,
+                (ratings_totals + (covered * ratings_totals) // count)
+                    // (negatives + 1),
+                ratings_totals)
+        if len(modrs) > suggest_count:
+            kth = len(modrs) - suggest_count
+            top = (modrs >= numpy.partition(modrs, kth)[kth]).nonzero()[0]
+        else:
+            top = range(len(modrs))
+        all_rated = [(int(modrs[i]),
+                (int(covered[i]), int(ratings_totals[i]), int(negatives[i])),
+                self.names[candidates[i]]) for i in top]
+        all_rated.sort(reverse=True)
+        return all_rated[:suggest_count]
+
+with STARTUP.phase("suggest engine"):
+    SUGGEST = SuggestEngine()
+
 def suggest(names, maxgen, suggest_count):
     team_dict = team(names)
     base_modr, base_extras, base_values = modified_rating(team_dict)
     team_dict["_RATING"] = (base_modr, base_extras)
-    evolves = set(gen_evolves(maxgen))
-    all_rated = []
-    for species in range(_vdex.SPECIES_COUNT):
-        species_details = _vdex.species_details(species)
-        if species_details.generation > maxgen:
-            continue
-        if species in evolves:
-            continue
-        name = _vdex.species_name(species)
-        modr, extras, _ = modified_rating({name: RATINGS[name]}, base_values)
-        all_rated.append((modr, extras, name))
-    all_rated.sort(reverse=True)
-    team_dict["_SUGGEST"] = all_rated[:suggest_count]
+    team_dict["_SUGGEST"] = SUGGEST.suggest(base_values, maxgen, suggest_count)
     return team_dict
 
 @app.route("/suggest")
 def route_suggest():
-    return flask.jsonify(suggest(flask.request.args.getlist("poke"),
-        flask.request.args.get("maxgen", default=5, type=int) - 1,
-        flask.request.args.get("suggest", default=12, type=int)))
+    species = canonical_team(flask.request.args.getlist("poke"))
+    maxgen = flask.request.args.get("maxgen", default=5, type=int) - 1
+    suggest_count = flask.request.args.get("suggest", default=12, type=int)
+    return flask.jsonify(RESULTS.get(("suggest", species, maxgen,
+            suggest_count),
+        lambda: suggest(team_names(species), maxgen, suggest_count)))
+
+@app.route("/cache")
+def route_cache():
+    return flask.jsonify(RESULTS.info())
+
+MAX_OPTIMIZE_BUDGET = 30.0
+
+@app.route("/optimize")
+def route_optimize():
+    args = flask.request.args
+    objective = args.get("objective", default="modified_rating")
+    if objective not in vdex_optimize.OBJECTIVES:
+        flask.abort(400)
+    budget = args.get("budget", default=vdex_optimize.DEFAULT_BUDGET,
+            type=float)
+    if not math.isfinite(budget) or not 0 < budget <= MAX_OPTIMIZE_BUDGET:
+        return flask.jsonify(error="Budget must be over 0 and at most {} "
+                "seconds".format(MAX_OPTIMIZE_BUDGET)), 400
+    try:
+        result = vdex_optimize.optimize(args.get("size", default=6, type=int),
+                objective, args.get("maxgen", default=5, type=int) - 1,
+                [vdex_names.resolve("species", name)
+                    for name in args.getlist("poke")], budget)
+    except ValueError as e:
+        return flask.jsonify(error=str(e)), 400
+    if result is not None:
+        result["team"] = [_vdex.species_name(species)
+                for species in result["team"]]
+    return flask.jsonify(result)
+
+STARTUP.report()